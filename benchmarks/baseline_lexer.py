@@ -0,0 +1,41 @@
+"""The list-based ``GitHubLexer.get_tokens_unprocessed`` from before tokens were streamed, for comparison
+
+Vendored from the original implementation, which builds the full ``PythonLexer`` token list to look ahead
+one token. Used by the ``lexer_streaming`` benchmark to measure the memory and throughput of the streaming lexer
+"""
+from pygments.token import Name, Keyword
+from pygments.lexers.python import PythonLexer
+
+from sphinx_github_style.lexer import get_builtins
+
+BUILTINS = get_builtins()
+
+
+class ListGitHubLexer(PythonLexer):
+    """The ``GitHubLexer`` as originally implemented, without the symbol table"""
+
+    name = 'TDK (list-based)'
+    aliases = []
+
+    def get_tokens_unprocessed(self, text):
+        """Override to add better syntax highlighting"""
+        tokens = list(PythonLexer.get_tokens_unprocessed(self, text))
+
+        for token_idx, (index, token, value) in enumerate(tokens):
+            # Highlight builtins as either function calls or type hints
+            if token is Name.Builtin and value in BUILTINS['classes']:
+                if tokens[token_idx+1][-1] == '(':
+                    yield index, Name.Builtin, value
+                else:
+                    yield index, Name.Builtin.Pseudo, value
+
+            elif token is Name:
+                if value[0].isupper():  # Highlight as class
+                    yield index, Name.Class, value
+                elif tokens[token_idx+1][-1] == '(':  # Highlight as function
+                    yield index, Keyword.Pseudo, value
+                else:
+                    yield index, Name, value
+
+            else:
+                yield index, token, value
@@ -0,0 +1,223 @@
+"""Generates a synthetic package and Sphinx project to benchmark ``sphinx-github-style`` against
+
+Usage::
+
+    python benchmarks/generate.py OUTPUT_DIR [--modules 20] [--classes 5] [--methods 5] ...
+"""
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PACKAGE = "synthpkg"
+
+#: Default size of the generated project
+DEFAULTS = {
+    "modules": 20,
+    "classes": 5,
+    "methods": 5,
+    "decorated": 2,
+    "properties": 2,
+    "functions": 5,
+    "code_blocks": 3,
+}
+
+DECORATORS = '''import functools
+
+
+def traced(func):
+    """Wraps a function, like most real-world decorators"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+'''
+
+CODE_BLOCK = '''.. code-block:: python
+
+   from {package}.{module} import Class0
+
+   # Create an instance and call a few methods
+   obj = Class0(value={index}, name="block-{index}")
+   for i in range(10):
+       if obj.method_0(i) is None:
+           print(f"{{obj.name}}: {{i!r}}", obj.value * 2.5)
+'''
+
+#: A literal block and a doctest block, which are highlighted as :confval:`highlight_language` and ``pycon``
+LITERAL_BLOCKS = '''Usage::
+
+   obj = {package}.{module}.Class0(value=1)
+   obj.method_0(2)
+
+>>> from {package}.{module} import function_0
+>>> function_0(3)  # doctest: +ELLIPSIS
+0
+'''
+
+
+def generate_module(index: int, classes: int, methods: int, decorated: int, properties: int, functions: int) -> str:
+    """Returns the source code of a synthetic module"""
+    lines = [
+        f'"""Synthetic module {index}"""',
+        "import functools",
+        "from typing import Any, Dict, Optional",
+        f"from {PACKAGE}._decorators import traced",
+        "",
+        f"CONSTANT_{index} = {index}",
+        "",
+    ]
+    for c in range(classes):
+        lines += [
+            "",
+            f"class Class{c}:",
+            f'    """A synthetic class with {methods} methods"""',
+            "",
+            "    def __init__(self, value: int = 0, name: Optional[str] = None):",
+            "        self.value = value",
+            "        self.name = name or self.__class__.__name__",
+            "        self._cache: Dict[str, Any] = {}",
+        ]
+        for m in range(methods):
+            if m < decorated:
+                lines += ["", "    @traced"]
+            else:
+                lines += [""]
+            lines += [
+                f"    def method_{m}(self, arg: int, *args, **kwargs) -> Optional[int]:",
+                f'        """Method {m} of :class:`Class{c}`',
+                "",
+                "        :param arg: an argument",
+                '        """',
+                "        # Some branching, so there's a realistic number of tokens",
+                f"        if arg > {m} and not args:",
+                f"            return self.value + arg * {m}",
+                "        elif kwargs.get('name') is not None:",
+                "            return len(kwargs['name'])",
+                "        return None",
+            ]
+        for p in range(properties):
+            decorator = "property" if p % 2 == 0 else "functools.cached_property"
+            lines += [
+                "",
+                f"    @{decorator}",
+                f"    def prop_{p}(self) -> str:",
+                f'        """Property {p}"""',
+                f"        return f'{{self.name}}-{p}'",
+            ]
+    for f in range(functions):
+        lines += [
+            "",
+            "",
+            f"def function_{f}(a: int, b: int = {f}) -> int:",
+            f'    """Function {f}"""',
+            "    total = 0",
+            "    for i in range(a):",
+            "        total += i * b  # accumulate",
+            "    return total",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def generate_page(index: int, code_blocks: int) -> str:
+    """Returns the reStructuredText source of the page documenting a synthetic module"""
+    module = f"mod_{index}"
+    title = f"``{PACKAGE}.{module}``"
+    lines = [
+        title, "=" * len(title), "",
+        f".. automodule:: {PACKAGE}.{module}", "   :members:", "   :undoc-members:", "",
+    ]
+    for b in range(code_blocks):
+        lines += [CODE_BLOCK.format(package=PACKAGE, module=module, index=b)]
+    if code_blocks:
+        lines += [LITERAL_BLOCKS.format(package=PACKAGE, module=module)]
+    return "\n".join(lines)
+
+
+def generate_conf(root: Path) -> str:
+    """Returns the ``conf.py`` of the synthetic project"""
+    return "\n".join([
+        "import os",
+        "import sys",
+        f"sys.path.insert(0, {str(root)!r})",
+        "",
+        "project = 'synthetic'",
+        "extensions = ['sphinx.ext.autodoc', 'sphinx_github_style']",
+        "linkcode_url = 'https://github.com/example/synthetic'",
+        "linkcode_blob = 'main'",
+        "html_theme = 'basic'",
+        "",
+    ])
+
+
+def generate_project(root: Path, git: bool = True, **sizes) -> Dict[str, int]:
+    """Writes a synthetic package and Sphinx project
+
+    :param root: the directory to write the project to; the package is written to ``root/synthpkg``
+       and the documentation to ``root/docs``
+    :param git: whether to commit the project to a new Git repository, so links can be resolved
+    :param sizes: overrides for the :data:`DEFAULTS`
+    :return: the sizes used to generate the project
+    """
+    sizes = {**DEFAULTS, **sizes}
+    root = Path(root).resolve()
+    package = root.joinpath(PACKAGE)
+    docs = root.joinpath("docs")
+    package.mkdir(parents=True, exist_ok=True)
+    docs.mkdir(parents=True, exist_ok=True)
+
+    package.joinpath("__init__.py").write_text('"""A synthetic package"""\n', encoding="utf-8")
+    package.joinpath("_decorators.py").write_text(DECORATORS, encoding="utf-8")
+
+    toctree = []
+    for i in range(sizes["modules"]):
+        source = generate_module(
+            i, sizes["classes"], sizes["methods"], sizes["decorated"], sizes["properties"], sizes["functions"]
+        )
+        package.joinpath(f"mod_{i}.py").write_text(source, encoding="utf-8")
+        docs.joinpath(f"mod_{i}.rst").write_text(generate_page(i, sizes["code_blocks"]), encoding="utf-8")
+        toctree.append(f"   mod_{i}")
+
+    index = ["Synthetic Project", "=================", "", ".. toctree::", "", *toctree, ""]
+    docs.joinpath("index.rst").write_text("\n".join(index), encoding="utf-8")
+    docs.joinpath("conf.py").write_text(generate_conf(root), encoding="utf-8")
+
+    if git and not root.joinpath(".git").exists():
+        git_cmd = ["git", "-c", "user.name=benchmark", "-c", "user.email=benchmark@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+        subprocess.run(git_cmd + ["add", "-A"], cwd=root, check=True)
+        subprocess.run(git_cmd + ["commit", "-q", "-m", "Synthetic project"], cwd=root, check=True)
+
+    return sizes
+
+
+def get_objects(sizes: Dict[str, int]) -> List[Tuple[str, str]]:
+    """Returns the ``(module, fullname)`` of every documented object in a synthetic package"""
+    objects = []
+    for i in range(sizes["modules"]):
+        module = f"{PACKAGE}.mod_{i}"
+        for c in range(sizes["classes"]):
+            objects.append((module, f"Class{c}"))
+            objects += [(module, f"Class{c}.method_{m}") for m in range(sizes["methods"])]
+            objects += [(module, f"Class{c}.prop_{p}") for p in range(sizes["properties"])]
+        objects += [(module, f"function_{f}") for f in range(sizes["functions"])]
+    return objects
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path, help="the directory to write the project to")
+    parser.add_argument("--no-git", action="store_true", help="don't commit the project to a Git repository")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, dest=name)
+    args = parser.parse_args(argv)
+
+    sizes = {name: getattr(args, name) for name in DEFAULTS}
+    generate_project(args.output, git=not args.no_git, **sizes)
+    print(f"Generated {sizes['modules']} modules in {os.fspath(args.output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Benchmarks the ``GitHubLexer`` against ``PythonLexer`` using the local CPython standard library as a corpus
+
+Usage::
+
+    python benchmarks/lexer_corpus.py --output lexer.json
+    python benchmarks/lexer_corpus.py --output new.json --compare lexer.json
+    python benchmarks/lexer_corpus.py --update-golden
+
+Reports the tokens per second and peak memory of each lexer, and checks that the ``GitHubLexer`` output is
+unchanged by comparing a digest of its token stream to the golden digest stored in ``lexer_golden.json``
+for the running versions of Python and Pygments. The exit code is ``1`` if the digest doesn't match,
+or if any metric regressed by more than ``--threshold`` when using ``--compare``
+"""
+import sys
+import json
+import hashlib
+import argparse
+import platform
+import sysconfig
+import tokenize
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from run import REPO_DIR, best_of, compare
+
+#: The file storing the golden digest of each Python and Pygments version
+GOLDEN_FILE = Path(__file__).resolve().parent.joinpath("lexer_golden.json")
+
+#: Directories of the standard library that aren't part of the corpus
+EXCLUDED_DIRS = {"site-packages", "dist-packages", "test", "tests", "idlelib", "__pycache__"}
+
+
+def get_corpus(limit: Optional[int] = None) -> List[Tuple[str, str]]:
+    """Returns the source code of every module in the standard library, sorted by path
+
+    :param limit: the maximum number of files to include
+    :return: the path of each file relative to the standard library, and its source code
+    """
+    stdlib = Path(sysconfig.get_paths()["stdlib"])
+    corpus = []
+
+    for path in sorted(stdlib.rglob("*.py")):
+        relpath = path.relative_to(stdlib)
+        if EXCLUDED_DIRS.intersection(relpath.parts[:-1]):
+            continue
+        try:
+            with tokenize.open(path) as f:
+                corpus.append((relpath.as_posix(), f.read()))
+        except (OSError, SyntaxError, UnicodeDecodeError):
+            continue
+        if limit is not None and len(corpus) == limit:
+            break
+    return corpus
+
+
+def get_golden_key() -> str:
+    """Returns the key of the golden digest for the running versions of Python and Pygments"""
+    import pygments
+    return f"python-{platform.python_version()}-pygments-{pygments.__version__}"
+
+
+def lex_corpus(lexer, corpus: List[Tuple[str, str]]) -> int:
+    """Lexes every file in the corpus, and returns the number of tokens"""
+    return sum(sum(1 for _ in lexer.get_tokens(source)) for _, source in corpus)
+
+
+def get_peak_memory(lexer, corpus: List[Tuple[str, str]]) -> int:
+    """Returns the peak memory allocated while lexing a file from the corpus, in bytes"""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _, source in corpus:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            for _ in lexer.get_tokens(source):
+                pass
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def check_equivalence(corpus: List[Tuple[str, str]]) -> Tuple[str, List[str]]:
+    """Lexes the corpus with both lexers, and returns a digest of the ``GitHubLexer`` token stream
+
+    The ``GitHubLexer`` may only change the type of a token, so the values of both token streams must match
+
+    :return: the hex digest, and the path of each file whose token values differ from the ``PythonLexer``
+    """
+    from pygments.lexers.python import PythonLexer
+    from sphinx_github_style.lexer import GitHubLexer
+
+    digest = hashlib.sha256()
+    mismatched = []
+    github_lexer, python_lexer = GitHubLexer(), PythonLexer()
+
+    for relpath, source in corpus:
+        digest.update(f"{relpath}\0".encode("utf-8"))
+        values = []
+        for token, value in github_lexer.get_tokens(source):
+            digest.update(f"{token}\t{value}\0".encode("utf-8"))
+            values.append(value)
+        if values != [value for _, value in python_lexer.get_tokens(source)]:
+            mismatched.append(relpath)
+
+    return digest.hexdigest(), mismatched
+
+
+def load_golden() -> Dict[str, dict]:
+    """Returns the stored golden digests, keyed by :func:`get_golden_key`"""
+    try:
+        return json.loads(GOLDEN_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", type=Path, help="the file to write the results to, as JSON")
+    parser.add_argument("--compare", type=Path, help="a previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="the relative change to report as a regression")
+    parser.add_argument("--repeat", type=int, default=1, help="the number of times to lex the corpus with each lexer")
+    parser.add_argument("--limit", type=int, help="only lex the first LIMIT files; skips the golden digest check")
+    parser.add_argument("--memory-files", type=int, default=20,
+                        help="the number of largest files to measure the peak memory of each lexer with")
+    parser.add_argument("--update-golden", action="store_true",
+                        help="store the digest of the current output as the golden digest, instead of checking it")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(REPO_DIR))
+    from pygments.lexers.python import PythonLexer
+    from sphinx_github_style.lexer import GitHubLexer
+
+    corpus = get_corpus(args.limit)
+    size = sum(len(source) for _, source in corpus)
+    print(f"Corpus: {len(corpus)} files, {size / 1e6:.1f} MB", file=sys.stderr)
+
+    results = {}
+
+    def record(metric, value, unit, higher_is_better):
+        results[metric] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+        print(f"  {metric}: {value:.4g} {unit}", file=sys.stderr)
+
+    largest = sorted(corpus, key=lambda item: len(item[1]), reverse=True)[:args.memory_files]
+    for name, lexer in (("python_lexer", PythonLexer()), ("github_lexer", GitHubLexer())):
+        print(f"Running {name}...", file=sys.stderr)
+        tokens = lex_corpus(lexer, corpus)
+        timing = best_of(args.repeat, lambda: lex_corpus(lexer, corpus))
+        record(f"corpus_{name}_tokens", tokens / timing, "tokens/s", True)
+        record(f"corpus_{name}_peak_memory", get_peak_memory(lexer, largest) / 1024, "KiB", False)
+
+    overhead = results["corpus_python_lexer_tokens"]["value"] / results["corpus_github_lexer_tokens"]["value"] - 1
+    record("corpus_github_lexer_overhead", overhead * 100, "%", False)
+
+    print("Checking output...", file=sys.stderr)
+    digest, mismatched = check_equivalence(corpus)
+    failed = False
+    for relpath in mismatched:
+        print(f"  token values differ from PythonLexer: {relpath}", file=sys.stderr)
+        failed = True
+
+    golden = load_golden()
+    key = get_golden_key()
+    if args.limit is not None:
+        print("  skipping the golden digest check, since --limit was used", file=sys.stderr)
+    elif args.update_golden:
+        golden[key] = {"digest": digest, "files": len(corpus)}
+        GOLDEN_FILE.write_text(json.dumps(golden, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"  stored the golden digest for {key}", file=sys.stderr)
+    elif key not in golden:
+        print(f"  no golden digest for {key}; run with --update-golden on a known good revision", file=sys.stderr)
+    elif golden[key]["digest"] != digest:
+        print(f"  output changed: digest {digest} doesn't match the golden digest for {key}", file=sys.stderr)
+        failed = True
+    else:
+        print(f"  output matches the golden digest for {key}", file=sys.stderr)
+
+    output = {
+        "metadata": {"python": platform.python_version(), "golden_key": key, "files": len(corpus), "digest": digest},
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(output, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        failed = compare(baseline, output, args.threshold) or failed
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
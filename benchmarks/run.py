@@ -0,0 +1,480 @@
+"""Runs the ``sphinx-github-style`` benchmarks against a synthetic project
+
+Usage::
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --output new.json --compare results.json
+    python benchmarks/run.py --check
+
+Each benchmark is repeated and the best run is reported. With ``--compare``, the results are compared
+to a previous results file, and the exit code is ``1`` if any benchmark regressed by more than ``--threshold``.
+With ``--check``, the checks are run instead of the benchmarks, and the exit code is ``1`` if any of them fails
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import filecmp
+import platform
+import tempfile
+import importlib
+import tracemalloc
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from generate import DEFAULTS, PACKAGE, generate_project, get_objects
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+#: Registered benchmarks, by name
+BENCHMARKS: Dict[str, Callable] = {}
+
+#: Registered checks, by name
+CHECKS: Dict[str, Callable] = {}
+
+
+def benchmark(func: Callable) -> Callable:
+    """Registers a benchmark, which returns a mapping of metric names to ``(value, unit, higher_is_better)``"""
+    BENCHMARKS[func.__name__.replace("bench_", "")] = func
+    return func
+
+
+def check(func: Callable) -> Callable:
+    """Registers a check, which returns a list of failure messages (empty if it passed)"""
+    CHECKS[func.__name__.replace("check_", "")] = func
+    return func
+
+
+def best_of(repeat: int, func: Callable, setup: Optional[Callable] = None) -> float:
+    """Returns the fastest of ``repeat`` calls to ``func``, in seconds
+
+    :param setup: called before each run, outside of the timing; its return value is passed to ``func``
+    """
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_python(code: str, cwd: Path) -> dict:
+    """Runs Python code in a fresh interpreter and returns the JSON object it prints"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(REPO_DIR), os.environ.get("PYTHONPATH", "")])}
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=cwd, env=env)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+@benchmark
+def bench_import(ctx) -> dict:
+    """Time to import the package in a fresh interpreter"""
+    code = (
+        "import time, json\n"
+        "start = time.perf_counter()\n"
+        "import sphinx_github_style\n"
+        "print(json.dumps(time.perf_counter() - start))\n"
+    )
+    timing = min(run_python(code, ctx.root) for _ in range(ctx.repeat))
+    return {"import_time": (timing, "s", False)}
+
+
+@benchmark
+def bench_setup(ctx) -> dict:
+    """Time for ``setup()`` to register the extension with a fresh Sphinx application, including imports"""
+    code = (
+        "import io, time, json\n"
+        "from sphinx.application import Sphinx\n"
+        "app = Sphinx('docs', None, '_build/setup', '_build/setup/.doctrees', 'html',\n"
+        "             status=io.StringIO(), warning=io.StringIO())\n"
+        "start = time.perf_counter()\n"
+        "app.setup_extension('sphinx_github_style')\n"
+        "print(json.dumps(time.perf_counter() - start))\n"
+    )
+    timing = min(run_python(code, ctx.root) for _ in range(ctx.repeat))
+    return {"setup_time": (timing, "s", False)}
+
+
+@benchmark
+def bench_linkcode_resolve(ctx) -> dict:
+    """Throughput of the default ``linkcode_resolve`` over every object in the synthetic package"""
+    from sphinx_github_style.utils.linkcode import get_linkcode_resolve
+
+    sys.path.insert(0, str(ctx.root))
+    try:
+        objects = get_objects(ctx.sizes)
+        for module in {module for module, _ in objects}:
+            importlib.import_module(module)
+
+        infos = [{"module": module, "fullname": fullname} for module, fullname in objects]
+        url = "https://github.com/example/synthetic/blob/main/{filepath}#L{linestart}-L{linestop}"
+
+        def resolve_all(linkcode_resolve):
+            for info in infos:
+                linkcode_resolve("py", info)
+
+        # A cold run parses each source file; a warm run reuses the parsed files
+        cold = best_of(ctx.repeat, resolve_all, lambda: get_linkcode_resolve(url, repo_dir=ctx.root))
+        linkcode_resolve = get_linkcode_resolve(url, repo_dir=ctx.root)
+        resolve_all(linkcode_resolve)
+        warm = best_of(ctx.repeat, lambda: resolve_all(linkcode_resolve))
+    finally:
+        sys.path.remove(str(ctx.root))
+        for module in [name for name in sys.modules if name.split(".")[0] == PACKAGE]:
+            del sys.modules[module]
+
+    return {
+        "linkcode_resolve_cold": (len(infos) / cold, "links/s", True),
+        "linkcode_resolve_warm": (len(infos) / warm, "links/s", True),
+    }
+
+
+@benchmark
+def bench_lexer(ctx) -> dict:
+    """Throughput of :class:`~.GitHubLexer` over the synthetic package's source code"""
+    from sphinx_github_style.lexer import GitHubLexer
+
+    source = "\n".join(
+        path.read_text(encoding="utf-8") for path in sorted(ctx.root.joinpath(PACKAGE).glob("*.py"))
+    )
+    lexer = GitHubLexer()
+    tokens = sum(1 for _ in lexer.get_tokens(source))
+    timing = best_of(ctx.repeat, lambda: sum(1 for _ in lexer.get_tokens(source)))
+    return {"lexer_tokens": (tokens / timing, "tokens/s", True)}
+
+
+def get_peak_memory(func: Callable) -> int:
+    """Returns the peak memory allocated by a call to ``func``, in bytes"""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark
+def bench_lexer_streaming(ctx) -> dict:
+    """Throughput and peak memory of the streaming :class:`~.GitHubLexer` and the original list-based one
+
+    Both lex a single block of at least ``--lexer-size`` MB, built by repeating the synthetic package's source code
+    """
+    from sphinx_github_style.lexer import GitHubLexer
+    from baseline_lexer import ListGitHubLexer
+
+    source = "\n".join(
+        path.read_text(encoding="utf-8") for path in sorted(ctx.root.joinpath(PACKAGE).glob("*.py"))
+    )
+    source *= max(1, int(ctx.lexer_size * 1e6 // len(source)) + 1)
+
+    results = {}
+    for name, lexer in (("list", ListGitHubLexer()), ("streaming", GitHubLexer())):
+        def lex():
+            return sum(1 for _ in lexer.get_tokens(source))
+
+        tokens = lex()
+        timing = best_of(ctx.repeat, lex)
+        results[f"lexer_{name}_tokens"] = (tokens / timing, "tokens/s", True)
+        results[f"lexer_{name}_peak_memory"] = (get_peak_memory(lex) / 1024, "KiB", False)
+    return results
+
+
+def make_doctrees(pages: int, objects: int) -> List:
+    """Returns synthetic doctrees, with the same structure as the pages generated by :mod:`sphinx.ext.linkcode`"""
+    from docutils import nodes
+    from sphinx import addnodes
+
+    doctrees = []
+    for page in range(pages):
+        section = nodes.section()
+        section += nodes.title(text=f"Page {page}")
+        section += nodes.paragraph("", "", nodes.Text("Some "), nodes.emphasis(text="text"), nodes.literal(text="code"))
+        for i in range(objects):
+            signode = addnodes.desc_signature()
+            signode += addnodes.desc_name(text=f"function_{i}")
+            signode += addnodes.desc_parameterlist("", "", addnodes.desc_parameter(text="a"))
+            refnode = nodes.reference("", "", internal=False, refuri=f"https://github.com/example/{page}#L{i}")
+            refnode += nodes.inline("", "[source]", classes=["viewcode-link"])
+            signode += refnode
+            content = addnodes.desc_content()
+            content += nodes.paragraph("", "", nodes.Text("Docs with a "), nodes.inline(text="reference"))
+            section += addnodes.desc("", signode, content)
+        doctrees.append(section)
+    return doctrees
+
+
+@benchmark
+def bench_linkcode_node_class(ctx) -> dict:
+    """Time for the :func:`~.add_linkcode_node_class` pass over ``--pages`` synthetic doctrees"""
+    from sphinx_github_style.add_linkcode_class import add_linkcode_node_class
+
+    config = SimpleNamespace(linkcode_link_text="View on GitHub", language="en")
+    app = SimpleNamespace(builder=SimpleNamespace(format="html", env=SimpleNamespace(config=config)))
+
+    def run(doctrees):
+        for doctree in doctrees:
+            add_linkcode_node_class(app, doctree, "")
+
+    timing = best_of(ctx.repeat, run, lambda: make_doctrees(ctx.pages, 5))
+    return {"linkcode_node_class": (timing, "s", False)}
+
+
+@benchmark
+def bench_sphinx_build(ctx) -> dict:
+    """Wall time of a full and a no-op incremental ``sphinx-build -b html`` of the synthetic project"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(REPO_DIR), os.environ.get("PYTHONPATH", "")])}
+    outdir = ctx.root.joinpath("_build", "html")
+    cmd = [sys.executable, "-m", "sphinx", "-q", "-b", "html", "docs", str(outdir)]
+
+    def build(*args):
+        subprocess.run(cmd + list(args), cwd=ctx.root, env=env, check=True, stderr=subprocess.DEVNULL)
+
+    full = best_of(ctx.repeat, lambda: build("-E"))
+    incremental = best_of(ctx.repeat, build)
+    return {
+        "sphinx_build_full": (full, "s", False),
+        "sphinx_build_incremental": (incremental, "s", False),
+    }
+
+
+def diff_dirs(left: Path, right: Path, ignored: Tuple[str, ...] = (".doctrees",)) -> List[str]:
+    """Returns the relative path of every file that differs between two directories, or is only in one of them
+
+    :param ignored: the names of directories to skip
+    """
+    def list_files(root):
+        return {
+            path.relative_to(root).as_posix() for path in root.rglob("*")
+            if path.is_file() and not ignored_parts.intersection(path.relative_to(root).parts)
+        }
+
+    ignored_parts = set(ignored)
+    left_files, right_files = list_files(left), list_files(right)
+    differences = sorted(left_files ^ right_files)
+    for file in sorted(left_files & right_files):
+        if not filecmp.cmp(left / file, right / file, shallow=False):
+            differences.append(file)
+    return differences
+
+
+#: The configurations that :func:`check_parallel_build` builds with, by name
+PARALLEL_CONFIGS = {
+    "default": {},
+    "opt-in": {
+        "github_style_highlight_cache": True,
+        "github_style_prehighlight": True,
+        "github_style_symbols": True,
+        "github_style_css_bundle": True,
+        "linkcode_manifest": True,
+        "linkcode_blob": "last_commit",
+    },
+}
+
+
+@check
+def check_parallel_build(ctx) -> List[str]:
+    """``sphinx-build -j 1`` and ``-j auto`` produce byte-identical HTML, with each of the :data:`PARALLEL_CONFIGS`
+
+    On a single CPU, ``-j auto`` builds serially, so ``-j 2`` is used instead to exercise the parallel read and write.
+    Each configuration is written to a ``conf.py`` that extends the project's, rather than passed with ``-D``,
+    since values like :confval:`linkcode_blob` are read from ``conf.py`` first
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(REPO_DIR), os.environ.get("PYTHONPATH", "")])}
+    jobs = "auto" if (os.cpu_count() or 1) > 1 else "2"
+    failures = []
+    for config, overrides in PARALLEL_CONFIGS.items():
+        confdir = ctx.root.joinpath("_build", f"parallel-{config}-conf")
+        confdir.mkdir(parents=True, exist_ok=True)
+        confdir.joinpath("conf.py").write_text("\n".join([
+            f"exec(open({str(ctx.root.joinpath('docs', 'conf.py'))!r}).read())",
+            *(f"{name} = {value!r}" for name, value in overrides.items()),
+            "",
+        ]), encoding="utf-8")
+
+        outdirs = {}
+        for name in ("1", jobs):
+            outdirs[name] = ctx.root.joinpath("_build", f"parallel-{config}-{name}")
+            cmd = [sys.executable, "-m", "sphinx", "-q", "-E", "-b", "html", "-j", name, "-c", str(confdir),
+                   "docs", str(outdirs[name])]
+            subprocess.run(cmd, cwd=ctx.root, env=env, check=True, stderr=subprocess.DEVNULL)
+
+        failures += [
+            f"{file} differs between -j 1 and -j {jobs} with the {config} configuration"
+            for file in diff_dirs(outdirs["1"], outdirs[jobs])
+        ]
+    return failures
+
+
+@check
+def check_prehighlight(ctx) -> List[str]:
+    """With :confval:`github_style_prehighlight`, no code block is highlighted while writing
+
+    Builds in a fresh interpreter that reports two CPUs, so blocks are highlighted in a pool even on a single CPU,
+    and with ``highlight_language = "python3"``, so ``::`` blocks aren't highlighted as ``"default"``
+    """
+    code = (
+        "import os, io, json\n"
+        "os.cpu_count = lambda: 2\n"
+        "from sphinx.application import Sphinx\n"
+        "from sphinx.highlighting import PygmentsBridge\n"
+        "pid, calls, highlight_block = os.getpid(), [], PygmentsBridge.highlight_block\n"
+        "def counted(self, source, lang, *args, **kwargs):\n"
+        "    if os.getpid() == pid:\n"
+        "        calls.append([lang, source.splitlines()[0]])\n"
+        "    return highlight_block(self, source, lang, *args, **kwargs)\n"
+        "PygmentsBridge.highlight_block = counted\n"
+        "app = Sphinx('docs', 'docs', '_build/prehighlight', '_build/prehighlight/.doctrees', 'html',\n"
+        "             confoverrides={'github_style_prehighlight': True, 'highlight_language': 'python3'},\n"
+        "             status=io.StringIO(), warning=io.StringIO(), freshenv=True)\n"
+        "app.build()\n"
+        "print(json.dumps(calls))\n"
+    )
+    return [
+        f"{lang} block starting with {line!r} was highlighted while writing"
+        for lang, line in run_python(code, ctx.root)
+    ]
+
+
+#: Modules that importing ``sphinx_github_style`` must not import, since they're only needed once the extension runs
+LAZY_MODULES = (
+    "pygments.lexers.python",
+    "subprocess",
+    "sphinx.ext.linkcode",
+    "sphinx_github_style.utils.git",
+    "sphinx_github_style.highlighting",
+)
+
+
+@check
+def check_lazy_imports(ctx) -> List[str]:
+    """Importing the package in a fresh interpreter doesn't import any of the :data:`LAZY_MODULES`"""
+    code = (
+        "import sys, json\n"
+        "import sphinx_github_style\n"
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))\n"
+    )
+    return [f"importing sphinx_github_style imports {name}" for name in run_python(code, ctx.root)]
+
+
+def get_metadata(ctx) -> dict:
+    """Returns the versions and parameters the benchmarks were run with"""
+    import pygments
+    import sphinx
+    import sphinx_github_style
+
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        "sphinx_github_style": sphinx_github_style.__version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "sphinx": sphinx.__display_version__,
+        "pygments": pygments.__version__,
+        "platform": platform.platform(),
+        "sizes": ctx.sizes,
+        "pages": ctx.pages,
+        "lexer_size": ctx.lexer_size,
+        "repeat": ctx.repeat,
+    }
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> bool:
+    """Prints the change in each metric from a baseline
+
+    :return: whether any metric regressed by more than ``threshold``
+    """
+    regressed = False
+    print(f"{'metric':<28} {'baseline':>14} {'current':>14} {'change':>9}")
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<28} {'-':>14} {result['value']:>14.4g} {'new':>9}")
+            continue
+
+        change = (result["value"] - old["value"]) / old["value"] if old["value"] else 0.0
+        worse = -change if result["higher_is_better"] else change
+        flag = ""
+        if worse > threshold:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{name:<28} {old['value']:>14.4g} {result['value']:>14.4g} {change:>+9.1%}{flag}")
+    return regressed
+
+
+def run_checks(ctx, names: Optional[List[str]] = None) -> int:
+    """Runs the registered checks, and prints the failures of each
+
+    :param names: the checks to run; defaults to all of them
+    :return: ``1`` if any check failed, otherwise ``0``
+    """
+    failed = False
+    for name in names or CHECKS:
+        if name not in CHECKS:
+            continue
+        print(f"Checking {name}...", file=sys.stderr)
+        failures = CHECKS[name](ctx)
+        for failure in failures:
+            print(f"  FAIL: {failure}", file=sys.stderr)
+        if not failures:
+            print("  ok", file=sys.stderr)
+        failed = failed or bool(failures)
+    return int(failed)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", type=Path, help="the file to write the results to, as JSON")
+    parser.add_argument("--compare", type=Path, help="a previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="the relative change to report as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of times to run each benchmark")
+    parser.add_argument("--pages", type=int, default=10000, help="the number of doctrees for linkcode_node_class")
+    parser.add_argument("--lexer-size", type=float, default=2.0,
+                        help="the size of the block for lexer_streaming, in MB")
+    parser.add_argument("--project", type=Path, help="where to generate the project (default: a temporary directory)")
+    parser.add_argument("--only", nargs="+", choices=sorted({*BENCHMARKS, *CHECKS}),
+                        help="the benchmarks (or checks, with --check) to run")
+    parser.add_argument("--check", action="store_true", help="run the checks instead of the benchmarks")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, dest=name)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = (args.project or Path(tmp)).resolve()
+        sizes = generate_project(root, **{name: getattr(args, name) for name in DEFAULTS})
+        ctx = SimpleNamespace(
+            root=root, sizes=sizes, pages=args.pages, repeat=args.repeat, lexer_size=args.lexer_size
+        )
+
+        if args.check:
+            return run_checks(ctx, args.only)
+
+        results = {}
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr)
+            for metric, (value, unit, higher_is_better) in BENCHMARKS[name](ctx).items():
+                results[metric] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+                print(f"  {metric}: {value:.4g} {unit}", file=sys.stderr)
+
+        output = {"metadata": get_metadata(ctx), "results": results}
+
+    if args.output:
+        args.output.write_text(json.dumps(output, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        return int(compare(baseline, output, args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,107 @@
 import sphinx
+import importlib
 from pathlib import Path
-from typing import Dict, Any
-from sphinx.application import Sphinx
-from .utils.sphinx import get_conf_val, set_conf_val
-from .utils.linkcode import get_linkcode_url, get_linkcode_revision, get_linkcode_resolve
+from typing import TYPE_CHECKING, Dict, Any
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
 
 __version__ = "1.2.2"
 __author__ = 'Adam Korn <hello@dailykitten.net>'
 
-from .add_linkcode_class import add_linkcode_node_class
-from .github_style import GitHubStyle
-from .lexer import GitHubLexer
+# Public attributes are imported on first access, so importing the package stays cheap
+_LAZY_ATTRS = {
+    'get_conf_val': '.utils.sphinx',
+    'set_conf_val': '.utils.sphinx',
+    'get_linkcode_url': '.utils.linkcode',
+    'get_linkcode_revision': '.utils.linkcode',
+    'get_linkcode_resolve': '.utils.linkcode',
+    'LinkcodeUrl': '.utils.linkcode',
+    'add_linkcode_node_class': '.add_linkcode_class',
+    'load_linkcode_manifest': '.linkcode_manifest',
+    'GitHubStyle': '.github_style',
+    'GitHubLexer': '.lexer',
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
 
-def setup(app: Sphinx) -> Dict[str, Any]:
+def setup(app: "Sphinx") -> Dict[str, Any]:
+    from sphinx.util import logging
+    from .utils.sphinx import get_conf_val, set_conf_val
+    from .utils.linkcode import get_linkcode_resolve, LinkcodeUrl
+    from .add_linkcode_class import add_linkcode_node_class
+    from .linkcode_env import (
+        init_linkcode_env, purge_linkcode_doc, get_outdated_linkcode_docs, merge_linkcode_env, write_linkcode_report
+    )
+    from .linkcode_validate import validate_linkcode_links
+    from .linkcode_manifest import write_linkcode_manifest
+    from .linkcode_prefetch import start_linkcode_prefetch, stop_linkcode_prefetch
+    from .highlighting import (
+        init_highlighter, evict_highlight_cache, load_symbol_table,
+        collect_code_blocks, purge_code_blocks, merge_code_blocks, prehighlight_code_blocks
+    )
+    from .css_bundle import init_css_bundle
+    from .lexer import GitHubLexer
+
     app.setup_extension('sphinx.ext.linkcode')
     app.connect("builder-inited", add_static_path)
+    app.connect("builder-inited", init_linkcode_env)
+    app.connect("builder-inited", init_highlighter)
+    app.connect("builder-inited", init_css_bundle)
+    app.connect("builder-inited", start_linkcode_prefetch)
+    app.connect('doctree-read', collect_code_blocks)
     app.connect('doctree-resolved', add_linkcode_node_class)
+    app.connect('env-purge-doc', purge_linkcode_doc)
+    app.connect('env-get-outdated', get_outdated_linkcode_docs)
+    app.connect('env-purge-doc', purge_code_blocks)
+    app.connect('env-merge-info', merge_linkcode_env)
+    app.connect('env-merge-info', merge_code_blocks)
+    app.connect('env-updated', load_symbol_table)
+    app.connect('env-updated', prehighlight_code_blocks)
+    app.connect('build-finished', write_linkcode_report)
+    app.connect('build-finished', validate_linkcode_links)
+    app.connect('build-finished', write_linkcode_manifest)
+    app.connect('build-finished', evict_highlight_cache)
+    app.connect('build-finished', stop_linkcode_prefetch)
 
     app.add_config_value('linkcode_blob', 'head', True)
     app.add_config_value('linkcode_link_text', 'View on GitHub', 'html')
+    app.add_config_value('linkcode_static', False, True)
+    app.add_config_value('linkcode_source_roots', [], True)
+    app.add_config_value('linkcode_roots', {}, True)
+    app.add_config_value('linkcode_match_installed', False, True)
+    app.add_config_value('linkcode_prefetch', [], '')
+    app.add_config_value('linkcode_cache_dir', None, '')
+    app.add_config_value('linkcode_watch', False, '')
+    app.add_config_value('linkcode_report', None, '')
+    app.add_config_value('linkcode_validate', False, '')
+    app.add_config_value('linkcode_manifest', False, '')
+    app.add_config_value('github_style_highlight_cache', False, '')
+    app.add_config_value('github_style_highlight_cache_size', 64, '')
+    app.add_config_value('github_style_theme', None, 'html')
+    app.add_config_value('github_style_symbols', False, 'html')
+    app.add_config_value('github_style_css_bundle', False, 'html')
+    app.add_config_value('github_style_prehighlight', False, '')
 
-    linkcode_blob = get_conf_val(app, "linkcode_blob")
-    linkcode_url = get_linkcode_url(
-        blob=get_linkcode_revision(linkcode_blob),
-        url=get_conf_val(app, 'linkcode_url'),
-        context=get_conf_val(app, 'html_context'),
-    )
     linkcode_func = get_conf_val(app, "linkcode_resolve")
 
     if not callable(linkcode_func):
-        print(
+        logging.getLogger(__name__).debug(
             "Function `linkcode_resolve` not found in ``conf.py``; "
             "using default function from ``sphinx_github_style``"
         )
-        linkcode_func = get_linkcode_resolve(linkcode_url)
+        linkcode_func = get_linkcode_resolve(LinkcodeUrl(app), app=app)
         set_conf_val(app, 'linkcode_resolve', linkcode_func)
 
     if not get_conf_val(app, 'pygments_style'):
@@ -43,7 +110,11 @@ def setup(app: Sphinx) -> Dict[str, Any]:
     app.add_lexer('python', GitHubLexer)
     app.add_css_file('github_style.css')
 
-    return {'version': sphinx.__display_version__, 'parallel_read_safe': True}
+    return {
+        'version': sphinx.__display_version__,
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
 
 
 def add_static_path(app) -> None:
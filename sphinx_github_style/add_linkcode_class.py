@@ -1,9 +1,37 @@
+from functools import lru_cache
 from sphinx.locale import _
+from sphinx import addnodes
 from sphinx.application import Sphinx
+from typing import Iterator
 from docutils.nodes import Node, Text
 from docutils import nodes
 
 
+@lru_cache(maxsize=None)
+def get_link_text(link_text: str, language: str) -> str:
+    """Translates the link text, once per text and language
+
+    :param link_text: the value of ``linkcode_link_text``
+    :param language: the language of the build, used to key the cache
+    """
+    return str(_(link_text))
+
+
+def find_signatures(doctree: Node) -> Iterator[addnodes.desc_signature]:
+    """Yields every :class:`~.desc_signature` in a doctree
+
+    Text elements (paragraphs, titles, literal blocks, etc.) can't contain object descriptions,
+    so their children aren't visited
+    """
+    stack = [doctree]
+    while stack:
+        for child in stack.pop().children:
+            if isinstance(child, addnodes.desc_signature):
+                yield child
+            elif isinstance(child, nodes.Element) and not isinstance(child, nodes.TextElement):
+                stack.append(child)
+
+
 def add_linkcode_node_class(app: Sphinx, doctree: Node, docname: str) -> None:
     """Changes every :class:`~.Node` added by :mod:`sphinx.ext.linkcode` to use the ``"linkcode-link"`` class
 
@@ -11,12 +39,23 @@ def add_linkcode_node_class(app: Sphinx, doctree: Node, docname: str) -> None:
     for different link text and CSS styling
 
     Sets the link text to ``linkcode_link_text``, or ``"View on GitHub"`` if not provided
+
+    .. note:: :mod:`sphinx.ext.linkcode` only adds links for HTML builders, as an external
+       :class:`~.reference` at the end of each :class:`~.desc_signature`, so those are the only nodes visited
     """
+    if getattr(app.builder, 'format', None) != 'html':
+        return
+
     env = app.builder.env
-    link_text = getattr(env.config, 'linkcode_link_text')
+    link_text = None
 
-    for node in list(doctree.findall(nodes.inline)):
-        if 'viewcode-link' in node['classes']:
-            if node.parent.get('internal', None) is False:
-                node['classes'] = ['linkcode-link']
-                node.children = [Text(_(f'{link_text}'))]
+    for signode in find_signatures(doctree):
+        for refnode in signode.children:
+            if not isinstance(refnode, nodes.reference) or refnode.get('internal', None) is not False:
+                continue
+            for node in refnode.children:
+                if isinstance(node, nodes.inline) and 'viewcode-link' in node['classes']:
+                    if link_text is None:
+                        link_text = get_link_text(f'{env.config.linkcode_link_text}', env.config.language)
+                    node['classes'] = ['linkcode-link']
+                    node.children = [Text(link_text)]
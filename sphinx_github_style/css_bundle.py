@@ -0,0 +1,132 @@
+import re
+import hashlib
+from pathlib import Path
+from typing import List, Optional
+from sphinx.util import logging
+from sphinx.application import Sphinx
+
+logger = logging.getLogger(__name__)
+
+#: The stylesheets that are replaced by bundles, in the order they're loaded
+BUNDLED_FILES = ('pygments.css', 'github_style.css')
+
+_STRING = r'''"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*\''''
+
+
+def minify_css(css: str) -> str:
+    """Minifies a stylesheet by removing its comments and any whitespace that isn't needed
+
+    Strings (ex. ``content`` values and quoted URLs) are left as is
+
+    :param css: the stylesheet to minify
+    """
+    css = re.sub(rf'({_STRING})|/\*.*?\*/', lambda m: m.group(1) or '', css, flags=re.S)
+    parts = re.split(rf'({_STRING})', css)
+
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i])
+        part = re.sub(r' ?([{};,>]) ?', r'\1', part)
+        parts[i] = re.sub(r': ', ':', part).replace(';}', '}')
+
+    return ''.join(parts).strip()
+
+
+def get_css_contents(app: Sphinx, name: str) -> str:
+    """Returns the contents of one of the :data:`BUNDLED_FILES`
+
+    :param name: the filename of the stylesheet
+    """
+    if name == 'pygments.css':
+        return app.builder.highlighter.get_stylesheet()
+    with open(Path(__file__).parent.joinpath('_static', name), encoding='utf-8') as f:
+        return f.read()
+
+
+def get_css_bundle(app: Sphinx, names: List[str]) -> str:
+    """Returns the minified contents of the given :data:`BUNDLED_FILES`, as one stylesheet
+
+    :param names: the filenames of the stylesheets, in the order they're loaded
+    """
+    return '\n'.join(minify_css(get_css_contents(app, name)) for name in names)
+
+
+def get_css_files(builder) -> Optional[List]:
+    """Returns the builder's list of stylesheets, or ``None`` if it doesn't have one"""
+    css_files = getattr(builder, '_css_files', None)
+    if css_files is None:
+        css_files = getattr(builder, 'css_files', None)
+    return css_files
+
+
+def get_css_name(css) -> str:
+    """Returns the filename of a stylesheet in the builder's list of stylesheets"""
+    return Path(getattr(css, 'filename', css)).name
+
+
+def get_bundled_runs(css_files: List) -> List[List[int]]:
+    """Groups the :data:`BUNDLED_FILES` into runs of stylesheets that are loaded one after another
+
+    Stylesheets are loaded in order of priority, so any stylesheet between two of the bundled files
+    (ex. the theme's stylesheets between ``pygments.css`` and ``github_style.css``) splits them into separate runs
+
+    :param css_files: the builder's list of stylesheets
+    :return: the indices of the stylesheets in each run, in the order they're loaded
+    """
+    order = sorted(range(len(css_files)), key=lambda i: getattr(css_files[i], 'priority', 500))
+    runs, run = [], []
+    for i in order:
+        if get_css_name(css_files[i]) in BUNDLED_FILES:
+            run.append(i)
+        elif run:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+    return runs
+
+
+def init_css_bundle(app: Sphinx) -> None:
+    """Replaces ``pygments.css`` and ``github_style.css`` in every page with minified, content-hashed stylesheets
+
+    Enabled by :confval:`github_style_css_bundle`. Each bundle is named after the hash of its contents
+    (ex. ``github_style.3f2a9c1e7b5d4e60.css``), so it can be cached indefinitely; any change to the
+    styles or the extension results in a new filename. Only stylesheets that are loaded one after another
+    are bundled together, and each bundle takes their place, so the cascade order relative to the theme's
+    stylesheets is unchanged. When the theme's stylesheets are loaded between them, ``pygments.css``
+    and ``github_style.css`` are minified and hashed separately. Previous bundles are kept, since pages
+    that weren't rewritten by an incremental build still use them
+    """
+    builder = app.builder
+    if not app.config.github_style_css_bundle or getattr(builder, 'format', None) != 'html':
+        return
+
+    css_files = get_css_files(builder)
+    highlighter = getattr(builder, 'highlighter', None)
+    if css_files is None or highlighter is None:
+        return
+
+    static_dir = Path(app.outdir, '_static')
+    static_dir.mkdir(parents=True, exist_ok=True)
+
+    replacements = {}
+    for run in get_bundled_runs(css_files):
+        names = [get_css_name(css_files[i]) for i in run]
+        bundle = get_css_bundle(app, names)
+        filename = f"{Path(names[-1]).stem}.{hashlib.sha256(bundle.encode('utf-8')).hexdigest()[:16]}.css"
+        static_dir.joinpath(filename).write_text(bundle, encoding='utf-8')
+        replacements[run[0]] = (filename, getattr(css_files[run[0]], 'priority', 500), names)
+
+    bundled = [i for i, css in enumerate(css_files) if get_css_name(css) in BUNDLED_FILES]
+    for i in reversed(bundled):
+        del css_files[i]
+
+    # Newer versions of Sphinx add the registered stylesheets again before writing
+    app.registry.css_files[:] = [
+        (name, attrs) for name, attrs in app.registry.css_files if name not in BUNDLED_FILES
+    ]
+
+    # Each bundle takes the place of the first stylesheet in its run
+    for index, (filename, priority, names) in sorted(replacements.items()):
+        builder.add_css_file(filename, priority=priority)
+        css_files.insert(index - sum(1 for i in bundled if i < index), css_files.pop())
+        logger.verbose(f"sphinx-github-style: bundled {', '.join(names)} into {filename}")
@@ -1,6 +1,8 @@
 import sphinx
+from typing import Any, Dict
 from pygments.token import *
 from pygments.style import Style
+from pygments.formatters import HtmlFormatter
 
 # Pygments Token/CSS Mappings: https://gist.github.com/TDKorn/f3a7fc98503eccb602ae7af428c0b981
 
@@ -40,102 +42,281 @@ pl = {
     "syntax-constant-other-reference-link": "#a5d6ff",
 }
 
+pl_light = {
+    "syntax-comment": "#57606a",
+    "syntax-constant": "#0550ae",
+    "syntax-entity": "#6639ba",
+    "syntax-storage-modifier-import": "#24292f",
+    "syntax-entity-tag": "#116329",
+    "syntax-keyword": "#cf222e",
+    "syntax-string": "#0a3069",
+    "syntax-variable": "#953800",
+    "syntax-brackethighlighter-unmatched": "#82071e",
+    "syntax-invalid-illegal-text": "#f6f8fa",
+    "syntax-invalid-illegal-bg": "#82071e",
+    "syntax-carriage-return-text": "#f6f8fa",
+    "syntax-carriage-return-bg": "#cf222e",
+    "syntax-string-regexp": "#116329",
+    "syntax-markup-list": "#3b2300",
+    "syntax-markup-heading": "#0550ae",
+    "syntax-markup-italic": "#24292f",
+    "syntax-markup-bold": "#24292f",
+    "syntax-markup-deleted-text": "#82071e",
+    "syntax-markup-deleted-bg": "#ffebe9",
+    "syntax-markup-inserted-text": "#116329",
+    "syntax-markup-inserted-bg": "#dafbe1",
+    "syntax-markup-changed-text": "#953800",
+    "syntax-markup-changed-bg": "#ffd8b5",
+    "syntax-markup-ignored-text": "#eaeef2",
+    "syntax-markup-ignored-bg": "#0550ae",
+    "syntax-meta-diff-range": "#8250df",
+    "syntax-brackethighlighter-angle": "#57606a",
+    "syntax-sublimelinter-gutter-mark": "#8c959f",
+    "syntax-constant-other-reference-link": "#0a3069",
+}
+
+pl_dimmed = {
+    "syntax-comment": "#768390",
+    "syntax-constant": "#6cb6ff",
+    "syntax-entity": "#dcbdfb",
+    "syntax-storage-modifier-import": "#adbac7",
+    "syntax-entity-tag": "#8ddb8c",
+    "syntax-keyword": "#f47067",
+    "syntax-string": "#96d0ff",
+    "syntax-variable": "#f69d50",
+    "syntax-brackethighlighter-unmatched": "#e5534b",
+    "syntax-invalid-illegal-text": "#cdd9e5",
+    "syntax-invalid-illegal-bg": "#922323",
+    "syntax-carriage-return-text": "#cdd9e5",
+    "syntax-carriage-return-bg": "#ad2e2c",
+    "syntax-string-regexp": "#8ddb8c",
+    "syntax-markup-list": "#eac55f",
+    "syntax-markup-heading": "#316dca",
+    "syntax-markup-italic": "#adbac7",
+    "syntax-markup-bold": "#adbac7",
+    "syntax-markup-deleted-text": "#ffd8d3",
+    "syntax-markup-deleted-bg": "#78191b",
+    "syntax-markup-inserted-text": "#b4f1b4",
+    "syntax-markup-inserted-bg": "#1b4721",
+    "syntax-markup-changed-text": "#ffddb0",
+    "syntax-markup-changed-bg": "#682d0f",
+    "syntax-markup-ignored-text": "#adbac7",
+    "syntax-markup-ignored-bg": "#255ab2",
+    "syntax-meta-diff-range": "#dcbdfb",
+    "syntax-brackethighlighter-angle": "#768390",
+    "syntax-sublimelinter-gutter-mark": "#545d68",
+    "syntax-constant-other-reference-link": "#96d0ff",
+}
+
+# ====  Theme name -> palette, including the colors that aren't part of PrettyLights  ====
+
+palettes = {
+    "dark": {
+        **pl,
+        "canvas-default": "#0d1117",
+        "fg-default": "#f8f8f2",
+        "fg-whitespace": "#f0f6fc",
+        "fg-output": "#adaeb6",
+        "fg-deleted": "#8b080b",
+    },
+    "light": {
+        **pl_light,
+        "canvas-default": "#ffffff",
+        "fg-default": "#1f2328",
+        "fg-whitespace": "#1f2328",
+        "fg-output": "#656d76",
+        "fg-deleted": "#82071e",
+    },
+    "dimmed": {
+        **pl_dimmed,
+        "canvas-default": "#22272e",
+        "fg-default": "#adbac7",
+        "fg-whitespace": "#cdd9e5",
+        "fg-output": "#768390",
+        "fg-deleted": "#922323",
+    },
+}
+
+# ====  Token -> palette key, followed by any Pygments style modifiers  ====
+
+token_styles = {
+    Whitespace: "fg-whitespace",
+
+    Comment: "syntax-comment",
+    Comment.Hashbang: "syntax-comment",
+    Comment.Multiline: "syntax-comment",
+    Comment.Preproc: "syntax-comment",
+    Comment.Single: "syntax-comment",
+    Comment.Special: "syntax-comment",
+
+    Generic: "fg-whitespace",
+    Generic.Deleted: "fg-deleted",
+    Generic.Emph: "fg-default underline",
+    Generic.Error: "fg-default",
+    Generic.Heading: "fg-default bold",
+    Generic.Inserted: "fg-default bold",
+    Generic.Output: "fg-output",
+    Generic.Prompt: "fg-default",
+    Generic.Strong: "fg-default",
+    Generic.Subheading: "fg-default bold",
+    Generic.Traceback: "fg-default",
+    Error: "fg-default",
+
+    Keyword: "syntax-keyword",
+    Keyword.Constant: "syntax-constant",  # Ex. None
+    Keyword.Declaration: "syntax-keyword",
+    Keyword.Namespace: "syntax-keyword",
+    Keyword.Pseudo: "syntax-entity",
+    Keyword.Reserved: "syntax-constant",
+    Keyword.Type: "syntax-constant",
+
+    Literal: "fg-default",
+    Literal.Date: "fg-default",
+    Literal.String.Affix: "fg-default",
+    Literal.String.Doc: "fg-default",
+    Literal.String.Double: "fg-default",
+    Literal.String.Interpol: "fg-default",
+    Literal.String.Single: "fg-default",
+
+    Name: "syntax-markup-bold",
+    Name.Variable: "syntax-markup-bold",
+    Name.Attribute: "syntax-markup-bold",
+    Name.Builtin.Pseudo: "syntax-markup-bold",  # Ex. self
+    Name.Builtin: "syntax-entity",  # Ex. print()
+    Name.Class: "syntax-variable",
+    Name.Constant: "syntax-constant",
+    Name.Decorator: "syntax-entity",
+    Name.Entity: "syntax-entity",
+    Name.Exception: "syntax-variable",
+    Name.Function: "syntax-entity",
+    Name.Function.Magic: "syntax-entity",
+    # Name.Label: "#8be9fd italic",
+    Name.Namespace: "syntax-markup-bold",
+    Name.Other: "syntax-markup-bold",
+    # Name.Other: pl["syntax-variable"],
+    # Name.Tag: "#ff79c6",
+    Name.Variable.Class: "syntax-variable",
+    Name.Variable.Global: "syntax-variable",
+    Name.Variable.Instance: "syntax-markup-bold",
+    Name.Variable.Magic: "syntax-markup-bold",
+
+    Number: "syntax-constant",
+    Number.Bin: "syntax-constant",
+    Number.Float: "syntax-constant",
+    Number.Hex: "syntax-constant",
+    Number.Integer: "syntax-constant",
+    Number.Integer.Long: "syntax-constant",
+    Number.Oct: "syntax-constant",
+    Operator: "syntax-constant",
+    Operator.Word: "syntax-constant",
+
+    # Other: "#f8f8f2",
+    Other.Constant: "syntax-constant",
+    Punctuation: "fg-default",
+    Punctuation.Definition.Comment: "syntax-comment",
+    String: "syntax-string",
+    String.Affix: "syntax-string",
+    String.Backtick: "syntax-string",
+    String.Char: "syntax-string",
+    String.Comment: "syntax-comment",
+    String.Doc: "syntax-string",
+    String.Double: "syntax-string",
+    String.Escape: "syntax-string",
+    String.Heredoc: "syntax-string",
+    String.Interpol: "syntax-string",
+    String.Other: "syntax-string",
+    String.Regex: "syntax-string",
+    String.Single: "syntax-string",
+    String.Symbol: "syntax-string",
+    Text: "syntax-markup-bold",
+}
+
+#: The HTML attribute that applies a theme from :data:`palettes` to an element and its descendants
+THEME_ATTRIBUTE = "data-github-style-theme"
+
+
+def get_styles(palette: Dict[str, str]) -> Dict[Any, str]:
+    """Returns the Pygments ``styles`` dict for a palette
+
+    :param palette: one of the :data:`palettes`
+    """
+    styles = {}
+    for token, style in token_styles.items():
+        key, *modifiers = style.split()
+        styles[token] = " ".join([palette[key], *modifiers])
+    return styles
+
 
 class GitHubStyle(Style):
     """A Pygments style similar to GitHub's pretty lights dark theme"""
 
-    background_color = "#0d1117"
+    background_color = palettes["dark"]["canvas-default"]
     default_style = ''
 
-    styles = {
-        Whitespace: "#f0f6fc",
-
-        Comment: pl["syntax-comment"],
-        Comment.Hashbang: pl["syntax-comment"],
-        Comment.Multiline: pl["syntax-comment"],
-        Comment.Preproc: pl["syntax-comment"],
-        Comment.Single: pl["syntax-comment"],
-        Comment.Special: pl["syntax-comment"],
-
-        Generic: "#f0f6fc",
-        Generic.Deleted: "#8b080b",
-        Generic.Emph: "#f8f8f2 underline",
-        Generic.Error: "#f8f8f2",
-        Generic.Heading: "#f8f8f2 bold",
-        Generic.Inserted: "#f8f8f2 bold",
-        Generic.Output: "#adaeb6",
-        Generic.Prompt: "#f8f8f2",
-        Generic.Strong: "#f8f8f2",
-        Generic.Subheading: "#f8f8f2 bold",
-        Generic.Traceback: "#f8f8f2",
-        Error: "#f8f8f2",
-
-        Keyword: pl["syntax-keyword"],
-        Keyword.Constant: pl["syntax-constant"],  # Ex. None
-        Keyword.Declaration: pl["syntax-keyword"],
-        Keyword.Namespace: pl["syntax-keyword"],
-        Keyword.Pseudo: pl["syntax-entity"],
-        Keyword.Reserved: pl["syntax-constant"],
-        Keyword.Type: pl["syntax-constant"],
-
-        Literal: "#f8f8f2",
-        Literal.Date: "#f8f8f2",
-        Literal.String.Affix: "#f8f8f2",
-        Literal.String.Doc: "#f8f8f2",
-        Literal.String.Double: "#f8f8f2",
-        Literal.String.Interpol: "#f8f8f2",
-        Literal.String.Single: "#f8f8f2",
-
-        Name: pl["syntax-markup-bold"],
-        Name.Variable: pl["syntax-markup-bold"],
-        Name.Attribute: pl["syntax-markup-bold"],
-        Name.Builtin.Pseudo: pl["syntax-markup-bold"],  # Ex. self
-        Name.Builtin: pl["syntax-entity"],  # Ex. print()
-        Name.Class: pl["syntax-variable"],
-        Name.Constant: pl["syntax-constant"],
-        Name.Decorator: pl["syntax-entity"],
-        Name.Entity: pl["syntax-entity"],
-        Name.Exception: pl["syntax-variable"],
-        Name.Function: pl["syntax-entity"],
-        Name.Function.Magic: pl["syntax-entity"],
-        # Name.Label: "#8be9fd italic",
-        Name.Namespace: pl["syntax-markup-bold"],
-        Name.Other: pl["syntax-markup-bold"],
-        # Name.Other: pl["syntax-variable"],
-        # Name.Tag: "#ff79c6",
-        Name.Variable.Class: pl["syntax-variable"],
-        Name.Variable.Global: pl["syntax-variable"],
-        Name.Variable.Instance: pl["syntax-markup-bold"],
-        Name.Variable.Magic: pl["syntax-markup-bold"],
-
-        Number: pl["syntax-constant"],
-        Number.Bin: pl["syntax-constant"],
-        Number.Float: pl["syntax-constant"],
-        Number.Hex: pl["syntax-constant"],
-        Number.Integer: pl["syntax-constant"],
-        Number.Integer.Long: pl["syntax-constant"],
-        Number.Oct: pl["syntax-constant"],
-        Operator: pl["syntax-constant"],
-        Operator.Word: pl["syntax-constant"],
-
-        # Other: "#f8f8f2",
-        Other.Constant: pl["syntax-constant"],
-        Punctuation: "#f8f8f2",
-        Punctuation.Definition.Comment: pl["syntax-comment"],
-        String: pl["syntax-string"],
-        String.Affix: pl["syntax-string"],
-        String.Backtick: pl["syntax-string"],
-        String.Char: pl["syntax-string"],
-        String.Comment: pl["syntax-comment"],
-        String.Doc: pl["syntax-string"],
-        String.Double: pl["syntax-string"],
-        String.Escape: pl["syntax-string"],
-        String.Heredoc: pl["syntax-string"],
-        String.Interpol: pl["syntax-string"],
-        String.Other: pl["syntax-string"],
-        String.Regex: pl["syntax-string"],
-        String.Single: pl["syntax-string"],
-        String.Symbol: pl["syntax-string"],
-        Text: pl["syntax-markup-bold"],
-    }
+    styles = get_styles(palettes["dark"])
+
+
+def get_token_variable(token) -> str:
+    """Returns the palette key that determines the color of a token, inherited from its closest styled parent"""
+    while token not in token_styles:
+        token = token.parent
+    return token_styles[token].split()[0]
+
+
+def get_themed_stylesheet(theme: str = "dark", selector: str = ".highlight") -> str:
+    """Returns a stylesheet for :class:`GitHubStyle` that supports every theme in :data:`palettes`
+
+    Colors are defined once per theme as CSS custom properties, and token rules with the
+    same declarations are grouped into a single rule. The default colors are set by ``theme``,
+    and can be overridden on any element by setting ``data-github-style-theme="light|dark|dimmed"``.
+    The attribute is namespaced so that the ``data-theme`` set by themes like Furo and the PyData theme
+    doesn't change the colors of code blocks
+
+    :param theme: the default theme; ``"auto"`` uses the dark theme unless the reader prefers a light color scheme
+    :param selector: the CSS selector of highlighted code blocks
+    """
+    if theme != "auto" and theme not in palettes:
+        raise ValueError(f"Unknown theme {theme!r}; must be 'auto' or one of {', '.join(palettes)}")
+
+    style = GitHubStyle
+    formatter = HtmlFormatter(style=style)
+    used = {"canvas-default"}
+    rules = {}
+
+    for token, ndef in style:
+        classname = formatter.ttype2class.get(token)
+        if not classname or not ndef["color"]:
+            continue
+        key = get_token_variable(token)
+        used.add(key)
+        declarations = [f"color: var(--pl-{key})"]
+        if ndef["bold"]:
+            declarations.append("font-weight: bold")
+        if ndef["italic"]:
+            declarations.append("font-style: italic")
+        if ndef["underline"]:
+            declarations.append("text-decoration: underline")
+        rules.setdefault("; ".join(declarations), []).append(classname)
+
+    def variables(palette):
+        return " ".join(f"--pl-{key}: {value};" for key, value in palette.items() if key in used)
+
+    lines = formatter.get_linenos_style_defs()
+    default = "dark" if theme == "auto" else theme
+    lines.append(f":root {{ {variables(palettes[default])} }}")
+    if theme == "auto":
+        lines.append(f"@media (prefers-color-scheme: light) {{ :root {{ {variables(palettes['light'])} }} }}")
+    for name, palette in palettes.items():
+        lines.append(f'[{THEME_ATTRIBUTE}="{name}"] {{ {variables(palette)} }}')
+
+    if style.highlight_color:
+        lines.append(f"{selector} .hll {{ background-color: {style.highlight_color} }}")
+
+    text = f"; color: var(--pl-{get_token_variable(Text)})" if Text in formatter.ttype2class else ""
+    lines.append(f"{selector} {{ background: var(--pl-canvas-default){text} }}")
+
+    for declarations, classnames in rules.items():
+        group = ", ".join(f"{selector} .{classname}" for classname in classnames)
+        lines.append(f"{group} {{ {declarations} }}")
 
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,463 @@
+import os
+import sys
+import json
+import hashlib
+import logging as _logging
+import pygments
+import sphinx
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from docutils import nodes
+from sphinx import addnodes
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.environment import BuildEnvironment
+from sphinx.errors import ExtensionError
+from sphinx.highlighting import PygmentsBridge
+from sphinx.util import logging
+from sphinx_github_style.github_style import GitHubStyle, get_themed_stylesheet, palettes
+from sphinx_github_style.lexer import GitHubLexer, get_symbol_table
+
+logger = logging.getLogger(__name__)
+
+
+#: The arguments the HTML translator highlights a code block with: ``(source, lang, opts, force, kwargs)``
+CodeBlock = Tuple[str, str, Dict, bool, Dict]
+
+#: The highlight setting of a document, as set by the ``highlight`` directive: ``(lang, force, linenothreshold)``
+HighlightSetting = Tuple[str, bool, int]
+
+
+class WarningDetector(_logging.Filter):
+    """Logging filter that records whether a warning was logged
+
+    :param suppress: whether to drop the warnings instead of letting them through
+    """
+
+    def __init__(self, suppress: bool = False):
+        super().__init__()
+        self.warned = False
+        self.suppress = suppress
+
+    def filter(self, record: _logging.LogRecord) -> bool:
+        if record.levelno >= _logging.WARNING:
+            self.warned = True
+            return not self.suppress
+        return True
+
+
+class HighlightCache:
+    """A persistent, content-addressed cache of highlighted code blocks
+
+    Each entry is stored in its own file, so entries can be written concurrently by parallel
+    write workers. The modification time of an entry is updated whenever it's used, and
+    the least recently used entries are evicted once the cache grows larger than ``max_size``
+
+    :param cache_dir: the directory to store the cache in
+    :param max_size: the maximum size of the cache, in bytes
+    """
+
+    def __init__(self, cache_dir: str, max_size: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+    def get_path(self, key: str) -> Path:
+        """Returns the path of the file storing an entry"""
+        return self.cache_dir.joinpath(key[:2], key + '.html')
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns a cached highlighted code block, or ``None`` if it's not in the cache"""
+        path = self.get_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                highlighted = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return highlighted
+
+    def set(self, key: str, highlighted: str) -> None:
+        """Adds a highlighted code block to the cache"""
+        path = self.get_path(key)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(highlighted)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.debug(f"sphinx-github-style: failed to cache highlighted code block: {e}")
+
+    def evict(self) -> int:
+        """Removes the least recently used entries until the cache is no larger than ``max_size``
+
+        :return: the number of entries that were removed
+        """
+        entries = []
+        for path in self.cache_dir.glob('*/*.html'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= entry_size
+            removed += 1
+        return removed
+
+
+class GitHubHighlighter:
+    """Wraps the :class:`~sphinx.highlighting.PygmentsBridge` of a builder
+
+    * If a ``cache`` is provided, previously highlighted code blocks are reused. Blocks are keyed by a
+      hash of their source, language, lexer and formatter options, the versions of ``sphinx-github-style``,
+      Pygments and Sphinx, the style definition, and the symbol table of the :class:`~.GitHubLexer`
+    * If a ``theme`` is provided, the stylesheet is generated by :func:`~.get_themed_stylesheet`
+    * Blocks highlighted ahead of time by :func:`prehighlight_code_blocks` are looked up by the same key
+
+    :param bridge: the builder's highlighter
+    :param cache: the cache to store highlighted code blocks in
+    :param theme: the default theme of the :class:`~.GitHubStyle` stylesheet
+    """
+
+    def __init__(self, bridge: PygmentsBridge, cache: Optional[HighlightCache] = None, theme: Optional[str] = None):
+        from sphinx_github_style import __version__
+
+        self.bridge = bridge
+        self.cache = cache
+        self.theme = theme
+        self.highlighted: Dict[str, str] = {}
+
+        style = bridge.formatter_args.get('style')
+        self.style_key = json.dumps([
+            __version__,
+            pygments.__version__,
+            sphinx.__display_version__,
+            f'{style.__module__}.{style.__qualname__}' if style else None,
+            getattr(style, 'background_color', None),
+            getattr(style, 'highlight_color', None),
+            sorted((str(token), value) for token, value in getattr(style, 'styles', {}).items()),
+        ])
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.bridge, name)
+
+    def get_stylesheet(self) -> str:
+        """Returns the stylesheet for highlighted code blocks, written to ``pygments.css``"""
+        if self.theme is None:
+            return self.bridge.get_stylesheet()
+        return get_themed_stylesheet(self.theme)
+
+    def get_cache_key(self, source: str, lang: str, opts: Optional[Dict] = None,
+                      force: bool = False, **kwargs) -> str:
+        """Returns the key of a code block in the :class:`HighlightCache`"""
+        block = json.dumps([source, lang, opts or {}, force, kwargs], sort_keys=True, default=repr)
+        if GitHubLexer.symbols_digest:
+            block += f'\0{GitHubLexer.symbols_digest}'
+        return hashlib.sha256(f'{self.style_key}\0{block}'.encode('utf-8')).hexdigest()
+
+    def highlight_block(self, source: str, lang: str, opts: Optional[Dict] = None,
+                        force: bool = False, location: Any = None, **kwargs) -> str:
+        """Highlights a code block, using the cached result if the same block was highlighted before
+
+        Blocks that log a warning while being highlighted aren't cached, so the warning is repeated in later builds
+        """
+        if self.cache is None and not self.highlighted:
+            return self.bridge.highlight_block(source, lang, opts, force, location, **kwargs)
+
+        if not isinstance(source, str):
+            source = source.decode()
+
+        key = self.get_cache_key(source, lang, opts, force, **kwargs)
+        highlighted = self.highlighted.get(key)
+        if highlighted is not None:
+            return highlighted
+
+        if self.cache is None:
+            return self.bridge.highlight_block(source, lang, opts, force, location, **kwargs)
+
+        highlighted = self.cache.get(key)
+        if highlighted is not None:
+            return highlighted
+
+        detector = WarningDetector()
+        highlighting_logger = _logging.getLogger(f'{logging.NAMESPACE}.sphinx.highlighting')
+        highlighting_logger.addFilter(detector)
+        try:
+            highlighted = self.bridge.highlight_block(source, lang, opts, force, location, **kwargs)
+        finally:
+            highlighting_logger.removeFilter(detector)
+
+        if not detector.warned:
+            self.cache.set(key, highlighted)
+        return highlighted
+
+
+def init_highlighter(app: Sphinx) -> None:
+    """Wraps the builder's highlighter with a :class:`GitHubHighlighter`
+
+    The highlighter is wrapped when :confval:`github_style_highlight_cache` or :confval:`github_style_prehighlight`
+    is enabled, or when the builder uses the :class:`~.GitHubStyle` and a :confval:`github_style_theme` is set
+    """
+    builder = app.builder
+    if getattr(builder, 'format', None) != 'html':
+        return
+
+    highlighter = getattr(builder, 'highlighter', None)
+    if not isinstance(highlighter, PygmentsBridge):
+        return
+
+    theme = app.config.github_style_theme
+    if highlighter.formatter_args.get('style') is not GitHubStyle:
+        theme = None
+    elif theme is not None and theme != 'auto' and theme not in palettes:
+        raise ExtensionError(
+            f"sphinx-github-style: invalid ``github_style_theme`` {theme!r}; "
+            f"must be 'auto' or one of {', '.join(palettes)}")
+
+    cache = None
+    if app.config.github_style_highlight_cache:
+        cache = HighlightCache(
+            cache_dir=os.path.join(app.doctreedir, 'github_style_highlight'),
+            max_size=app.config.github_style_highlight_cache_size * 1024 * 1024,
+        )
+
+    if cache is not None or theme is not None or app.config.github_style_prehighlight:
+        builder.highlighter = GitHubHighlighter(highlighter, cache, theme)
+
+
+def evict_highlight_cache(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Evicts the least recently used entries from the :class:`HighlightCache` at the end of the build"""
+    highlighter = getattr(app.builder, 'highlighter', None)
+    if isinstance(highlighter, GitHubHighlighter) and highlighter.cache is not None:
+        removed = highlighter.cache.evict()
+        if removed:
+            logger.verbose(f"sphinx-github-style: evicted {removed} highlighted code blocks from the cache")
+
+
+def load_symbol_table(app: Sphinx, env: BuildEnvironment) -> None:
+    """Loads the symbol table of the :class:`~.GitHubLexer` from the Python domain, once every document is read
+
+    Enabled by :confval:`github_style_symbols`
+    """
+    if not app.config.github_style_symbols:
+        GitHubLexer.set_symbols(None)
+        return
+
+    domain = env.get_domain('py')
+    symbols = get_symbol_table((fullname, obj.objtype) for fullname, obj in domain.objects.items())
+    GitHubLexer.set_symbols(symbols)
+    logger.verbose(f"sphinx-github-style: loaded {len(symbols)} symbols for highlighting")
+
+
+def is_pyconsole(source: str, lang: str) -> bool:
+    """Returns whether a literal block is a Python console session, as determined by
+    :class:`~sphinx.transforms.post_transforms.code.TrimDoctestFlagsTransform`
+    """
+    if lang in {'pycon', 'pycon3'}:
+        return True
+    if lang in {'py', 'python', 'py3', 'python3', 'default'}:
+        return source.startswith('>>>')
+    if lang == 'guess':
+        from pygments.lexers import PythonConsoleLexer, guess_lexer
+        try:
+            return isinstance(guess_lexer(source), PythonConsoleLexer)
+        except Exception:
+            pass
+    return False
+
+
+def get_code_block(node: nodes.FixedTextElement, setting: HighlightSetting, config: Config) -> Optional[CodeBlock]:
+    """Returns the arguments that the HTML translator highlights a literal or doctest block with
+
+    Blocks are collected once the document is read, before the post-transforms that set their language
+    and trim their doctest flags run, so this applies the same rules as
+    :class:`~sphinx.transforms.post_transforms.code.HighlightLanguageTransform` and
+    :class:`~sphinx.transforms.post_transforms.code.TrimDoctestFlagsTransform`
+
+    :param setting: the highlight setting in effect where the block is
+    :return: the ``(source, lang, opts, force, kwargs)`` of the block, or ``None`` if it isn't highlighted
+    """
+    if node.rawsource != node.astext():  # Parsed literal blocks aren't highlighted
+        return None
+
+    source = node.rawsource
+    lang = node.get('language', 'default')
+    force = node.get('force', False)
+    linenos = node.get('linenos', False)
+
+    if isinstance(node, nodes.literal_block):  # The language of doctest blocks isn't set
+        if 'language' not in node:
+            lang, force = setting[0], setting[1]
+        if 'linenos' not in node:
+            linenos = source.count('\n') >= setting[2] - 1
+
+    if isinstance(node, nodes.doctest_block) or is_pyconsole(source, lang):
+        if node.get('trim_flags', config.trim_doctest_flags):
+            from sphinx.ext.doctest import blankline_re, doctestopt_re
+            source = doctestopt_re.sub('', blankline_re.sub('', source))
+
+    kwargs = {key: value for key, value in node.get('highlight_args', {}).items() if key != 'force'}
+    if linenos and getattr(config, 'html_codeblock_linenos_style', None):
+        linenos = config.html_codeblock_linenos_style
+    kwargs['linenos'] = linenos
+
+    opts = config.highlight_options.get(lang, {}) if isinstance(config.highlight_options, dict) else {}
+    return source, lang, opts, force, kwargs
+
+
+def get_code_blocks(doctree: nodes.document, config: Config) -> List[CodeBlock]:
+    """Returns the arguments that the HTML translator highlights each literal and doctest block of a document with
+
+    The highlight setting of each block is tracked the same way as by
+    :class:`~sphinx.transforms.post_transforms.code.HighlightLanguageTransform`: it starts as
+    :confval:`highlight_language` and is replaced by each ``highlight`` directive
+    """
+    setting = (config.highlight_language, False, sys.maxsize)
+    blocks = []
+    for node in doctree.findall(lambda n: isinstance(n, (addnodes.highlightlang, nodes.literal_block,
+                                                         nodes.doctest_block))):
+        if isinstance(node, addnodes.highlightlang):
+            setting = (node['lang'], node['force'], node['linenothreshold'])
+            continue
+        block = get_code_block(node, setting, config)
+        if block is not None:
+            blocks.append(block)
+    return blocks
+
+
+def collect_code_blocks(app: Sphinx, doctree: nodes.document) -> None:
+    """Stores the code blocks of each document that's read, to be highlighted by :func:`prehighlight_code_blocks`"""
+    if not app.config.github_style_prehighlight or getattr(app.builder, 'format', None) != 'html':
+        return
+
+    blocks = get_code_blocks(doctree, app.config)
+    if blocks:
+        if not hasattr(app.env, 'github_style_code_blocks'):
+            app.env.github_style_code_blocks = {}
+        app.env.github_style_code_blocks[app.env.docname] = blocks
+
+
+def purge_code_blocks(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    """Removes the stored code blocks of a document"""
+    if hasattr(env, 'github_style_code_blocks'):
+        env.github_style_code_blocks.pop(docname, None)
+
+
+def merge_code_blocks(app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment) -> None:
+    """Merges the code blocks collected by a parallel read worker into the main environment"""
+    blocks = getattr(other, 'github_style_code_blocks', {})
+    for docname in docnames:
+        if docname in blocks:
+            if not hasattr(env, 'github_style_code_blocks'):
+                env.github_style_code_blocks = {}
+            env.github_style_code_blocks[docname] = blocks[docname]
+
+
+#: The highlighter of a :func:`prehighlight_code_blocks` worker process
+_worker_bridge: Optional[PygmentsBridge] = None
+
+
+def init_highlight_worker(bridge: PygmentsBridge, lexers: Dict[str, Any], symbols: Optional[Dict]) -> None:
+    """Initializes a :func:`prehighlight_code_blocks` worker with the lexers and symbol table of the main process"""
+    global _worker_bridge
+    import sphinx.highlighting
+
+    sphinx.highlighting.lexer_classes.update(lexers)
+    GitHubLexer.set_symbols(symbols)
+    _worker_bridge = bridge
+
+
+def highlight_in_worker(blocks: List[Tuple[str, CodeBlock]]) -> List[Tuple[str, Optional[str]]]:
+    """Highlights code blocks in a :func:`prehighlight_code_blocks` worker
+
+    Warnings are suppressed, and blocks that log one aren't returned, so that they're
+    highlighted again by the HTML translator and the warning is logged with its location
+
+    :param blocks: the key and :data:`CodeBlock` of each block
+    :return: the key and highlighted HTML of each block, or ``None`` if it logged a warning
+    """
+    highlighting_logger = _logging.getLogger(f'{logging.NAMESPACE}.sphinx.highlighting')
+    results = []
+
+    for key, (source, lang, opts, force, kwargs) in blocks:
+        detector = WarningDetector(suppress=True)
+        highlighting_logger.addFilter(detector)
+        try:
+            highlighted = _worker_bridge.highlight_block(source, lang, opts, force, **kwargs)
+        except Exception:
+            highlighted = None
+        finally:
+            highlighting_logger.removeFilter(detector)
+        results.append((key, None if detector.warned else highlighted))
+    return results
+
+
+def prehighlight_code_blocks(app: Sphinx, env: BuildEnvironment) -> None:
+    """Highlights the code blocks of every document that was read in a pool of worker processes
+
+    Enabled by :confval:`github_style_prehighlight`. Runs once every document is read, so the
+    HTML translator only has to look up each block instead of highlighting it. Blocks that are
+    already in the :class:`HighlightCache` are skipped, and the results are added to it.
+    Nothing is done if there's only one CPU, since there would be nothing to gain
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import sphinx.highlighting
+
+    code_blocks = getattr(env, 'github_style_code_blocks', None)
+    env.github_style_code_blocks = {}  # Only needed until they're highlighted; keeps them out of the pickle
+    highlighter = getattr(app.builder, 'highlighter', None)
+    if not code_blocks or not isinstance(highlighter, GitHubHighlighter):
+        return
+
+    pending = {}
+    for blocks in code_blocks.values():
+        for block in blocks:
+            key = highlighter.get_cache_key(block[0], block[1], block[2], block[3], **block[4])
+            if key not in pending and key not in highlighter.highlighted:
+                if highlighter.cache is None or highlighter.cache.get(key) is None:
+                    pending[key] = block
+    if not pending:
+        return
+
+    workers = os.cpu_count() or 1
+    if workers < 2:
+        logger.verbose("sphinx-github-style: only one CPU is available; code blocks will be highlighted while writing")
+        return
+
+    symbols = dict(GitHubLexer.symbols) if GitHubLexer.symbols else None
+    items = list(pending.items())
+    chunksize = max(1, len(items) // (workers * 4))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    highlighted_count = 0
+
+    try:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_highlight_worker,
+                initargs=(highlighter.bridge, dict(sphinx.highlighting.lexer_classes), symbols),
+        ) as executor:
+            for results in executor.map(highlight_in_worker, chunks):
+                for key, highlighted in results:
+                    if highlighted is None:
+                        continue
+                    highlighted_count += 1
+                    highlighter.highlighted[key] = highlighted
+                    if highlighter.cache is not None:
+                        highlighter.cache.set(key, highlighted)
+    except Exception as e:  # ex. a lexer that can't be pickled; blocks are highlighted while writing instead
+        logger.warning(f"sphinx-github-style: unable to highlight code blocks in parallel: {e}",
+                       type='github_style', subtype='prehighlight')
+        return
+
+    logger.verbose(f"sphinx-github-style: highlighted {highlighted_count} of {len(pending)} "
+                   f"code blocks with {workers} processes")
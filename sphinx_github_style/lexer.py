@@ -1,12 +1,41 @@
 import builtins
-from typing import Set, Dict
-from pygments.token import Name, Keyword
+from types import MappingProxyType
+from functools import lru_cache
+from typing import Dict, Iterable, Mapping, FrozenSet, Optional, Tuple
+from pygments.token import Name, Keyword, _TokenType
 from pygments.lexers.python import PythonLexer
-from inspect import getmembers, isclass, isbuiltin, ismethoddescriptor
 
+#: The kind of symbol that each Python domain object type is highlighted as
+OBJTYPE_KINDS = {
+    'class': 'class',
+    'exception': 'class',
+    'function': 'function',
+    'method': 'function',
+    'classmethod': 'function',
+    'staticmethod': 'function',
+    'decorator': 'function',
+    'data': 'variable',
+    'attribute': 'variable',
+    'property': 'variable',
+}
+
+#: The token type that each kind of symbol is highlighted with
+SYMBOL_TOKENS = {
+    'class': Name.Class,
+    'function': Keyword.Pseudo,  # Same as function calls
+    'constant': Name.Constant,
+    'variable': Name,
+}
+
+
+@lru_cache(maxsize=None)
+def get_builtins() -> Mapping[str, FrozenSet[str]]:
+    """Returns a dictionary containing names of built-in functions, classes, and methods
+
+    The table is built on first use and cached for the running Python version
+    """
+    from inspect import getmembers, isclass, isbuiltin, ismethoddescriptor
 
-def get_builtins() -> Dict[str, Set]:
-    """Returns a dictionary containing names of built-in functions, classes, and methods"""
     funcs_meths = set(dict(getmembers(builtins, isbuiltin)))
     classes = set()
 
@@ -15,13 +44,37 @@ def get_builtins() -> Dict[str, Set]:
         funcs_meths.update(dict(methods))
         classes.add(class_name)
 
-    return {
-        'funcs': funcs_meths,
-        'classes': classes
-    }
+    return MappingProxyType({
+        'funcs': frozenset(funcs_meths),
+        'classes': frozenset(classes)
+    })
+
+
+def __getattr__(name: str):
+    if name == 'BUILTINS':
+        return get_builtins()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_symbol_table(objects: Iterable[Tuple[str, str]]) -> Dict[str, _TokenType]:
+    """Returns a symbol table mapping the names of a project's objects to the token type to highlight them with
+
+    Names are matched without their module or class, so a name that's used for different kinds
+    of objects (ex. a class in one module and a function in another) is left out of the table
 
+    :param objects: the ``(fullname, objtype)`` of each object, ex. from the Python domain
+    """
+    kinds = {}
+    for fullname, objtype in objects:
+        kind = OBJTYPE_KINDS.get(objtype)
+        if kind is None:
+            continue
+        name = fullname.rpartition('.')[2]
+        if kind == 'variable' and name.isupper():
+            kind = 'constant'
+        kinds.setdefault(name, set()).add(kind)
 
-BUILTINS = get_builtins()
+    return {name: SYMBOL_TOKENS[kind.pop()] for name, kind in kinds.items() if len(kind) == 1}
 
 
 class GitHubLexer(PythonLexer):
@@ -31,25 +84,64 @@ class GitHubLexer(PythonLexer):
     url = 'https://github.com/TDKorn'
     aliases = ['tdk']
 
+    #: The symbol table of the documented project, if loaded with :meth:`set_symbols`
+    symbols: Optional[Mapping[str, _TokenType]] = None
+
+    #: A hash of the :attr:`symbols`, or an empty string if there are none
+    symbols_digest: str = ''
+
+    @classmethod
+    def set_symbols(cls, symbols: Optional[Mapping[str, _TokenType]]) -> None:
+        """Sets the symbol table used to highlight names, as returned by :func:`get_symbol_table`
+
+        Names in the table are highlighted by what they refer to, instead of guessed from their
+        capitalization and whether they're called. Names that aren't in the table are still guessed
+
+        :param symbols: the symbol table, or ``None`` to remove it
+        """
+        import json
+        import hashlib
+
+        cls.symbols = MappingProxyType(dict(symbols)) if symbols else None
+        cls.symbols_digest = hashlib.sha256(json.dumps(
+            sorted((name, str(token)) for name, token in symbols.items())
+        ).encode('utf-8')).hexdigest() if symbols else ''
+
     def get_tokens_unprocessed(self, text):
-        """Override to add better syntax highlighting"""
-        tokens = list(PythonLexer.get_tokens_unprocessed(self, text))
+        """Override to add better syntax highlighting
+
+        Tokens are streamed from :class:`~pygments.lexers.python.PythonLexer` with
+        one token of lookahead, so memory use doesn't grow with the size of the code block
+        """
+        builtin_classes = get_builtins()['classes']
+        symbols = self.symbols or {}
+        tokens = PythonLexer.get_tokens_unprocessed(self, text)
+        token = next(tokens, None)
+
+        while token is not None:
+            next_token = next(tokens, None)
+            index, token, value = token
+            is_call = next_token is not None and next_token[-1] == '('
 
-        for token_idx, (index, token, value) in enumerate(tokens):
             # Highlight builtins as either function calls or type hints
-            if token is Name.Builtin and value in BUILTINS['classes']:
-                if tokens[token_idx+1][-1] == '(':
+            if token is Name.Builtin and value in builtin_classes:
+                if is_call:
                     yield index, Name.Builtin, value
                 else:
                     yield index, Name.Builtin.Pseudo, value
 
             elif token is Name:
-                if value[0].isupper():  # Highlight as class
+                symbol = symbols.get(value)
+                if symbol is not None:  # Highlight from the symbol table
+                    yield index, symbol, value
+                elif value[0].isupper():  # Highlight as class
                     yield index, Name.Class, value
-                elif tokens[token_idx+1][-1] == '(':  # Highlight as function
+                elif is_call:  # Highlight as function
                     yield index, Keyword.Pseudo, value
                 else:
                     yield index, Name, value
 
             else:
                 yield index, token, value
+
+            token = next_token
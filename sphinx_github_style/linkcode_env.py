@@ -0,0 +1,240 @@
+import os
+import json
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+from sphinx.util import logging
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx_github_style.utils.locations import SourceLocation, get_fingerprint
+from sphinx_github_style.utils.registry import load_file_revisions
+
+logger = logging.getLogger(__name__)
+
+#: The key of a resolved object: ``(module, fullname)``
+LinkcodeKey = Tuple[str, str]
+
+
+def init_linkcode_env(app: Sphinx) -> None:
+    """Adds the attributes used to store resolved source code locations to the build environment
+
+    * ``linkcode_locations``: maps each resolved object to its source file and :class:`~.SourceLocation`
+    * ``linkcode_modules``: maps each resolved object to the source file of the module it's documented in,
+      if that isn't the file that defines it (ex. objects that are re-exported from another module)
+    * ``linkcode_fingerprints``: maps each source file to its fingerprint when it was resolved
+    * ``linkcode_revisions``: maps each source file to the last commit that modified it when it was resolved,
+      if :confval:`linkcode_blob` is ``"last_commit"``
+    * ``linkcode_documents``: maps each document to the objects it resolved links for
+    * ``linkcode_stats``: maps each document to the counts and timings of its :func:`linkcode_resolve` calls
+    """
+    env = app.env
+    for attr in ('linkcode_locations', 'linkcode_modules', 'linkcode_fingerprints', 'linkcode_revisions',
+                 'linkcode_documents', 'linkcode_stats'):
+        if not hasattr(env, attr):
+            setattr(env, attr, {})
+
+
+def get_linkcode_location(env: BuildEnvironment, key: LinkcodeKey) -> Optional[SourceLocation]:
+    """Returns the stored :class:`~.SourceLocation` of an object, and records that the current document uses it
+
+    :param key: the ``(module, fullname)`` of the object
+    :return: the location resolved by a previous build, or ``None`` if it needs to be resolved
+    """
+    env.linkcode_documents.setdefault(env.docname, set()).add(key)
+    stored = env.linkcode_locations.get(key)
+    return stored[1] if stored else None
+
+
+def set_linkcode_location(env: BuildEnvironment, key: LinkcodeKey, path: str, location: SourceLocation,
+                          module_path: Optional[str] = None) -> None:
+    """Stores the resolved :class:`~.SourceLocation` of an object and the fingerprints of its source files
+
+    The location is invalidated once either the file that defines the object or the file of the module
+    it's documented in changes, since the module may import the object from somewhere else
+
+    :param key: the ``(module, fullname)`` of the object
+    :param path: the absolute path of the source file
+    :param location: the location of the object's source code
+    :param module_path: the absolute path of the source file of the module the object is documented in
+    """
+    paths = [path] if module_path in (None, path) else [path, module_path]
+    for file in paths:
+        if file not in env.linkcode_fingerprints:
+            try:
+                env.linkcode_fingerprints[file] = get_fingerprint(file)
+            except OSError:
+                return
+
+    env.linkcode_locations[key] = (path, location)
+    if len(paths) > 1:
+        env.linkcode_modules[key] = module_path
+    else:
+        env.linkcode_modules.pop(key, None)
+
+
+def set_linkcode_revision(env: BuildEnvironment, path: str, revision: str) -> None:
+    """Stores the last commit that modified a source file, so its documents are re-read once it changes
+
+    :param path: the absolute path of the source file
+    :param revision: the SHA of the commit, or an empty string if the file hasn't been committed
+    """
+    if path in env.linkcode_fingerprints:
+        env.linkcode_revisions[path] = revision
+
+
+def get_changed_revisions(env: BuildEnvironment) -> Set[str]:
+    """Returns the source files whose last modifying commit changed since they were resolved
+
+    :return: the absolute paths of the source files
+    """
+    roots = {}
+    for path, location in env.linkcode_locations.values():
+        if path in env.linkcode_revisions and location.root:
+            roots.setdefault(location.root, {})[path] = location.filepath
+
+    changed = set()
+    for root, files in roots.items():
+        revisions = load_file_revisions(Path(root))
+        for path, filepath in files.items():
+            if revisions.get(filepath, '') != env.linkcode_revisions[path]:
+                changed.add(path)
+    return changed
+
+
+def record_linkcode_stat(env: BuildEnvironment, status: str, elapsed: float) -> None:
+    """Records the outcome of a :func:`linkcode_resolve` call for the current document
+
+    :param status: ``"resolved"``, ``"cached"``, or the reason the object was skipped
+       (``"no_module"``, ``"attribute_error"``, ``"outside_repo"``, or ``"no_source"``)
+    :param elapsed: the time spent resolving the link, in seconds
+    """
+    stats = env.linkcode_stats.setdefault(env.docname, {'time': 0.0})
+    stats[status] = stats.get(status, 0) + 1
+    stats['time'] += elapsed
+
+
+def purge_linkcode_doc(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    """Removes the record of the objects resolved by a document that is being re-read or was removed"""
+    env.linkcode_documents.pop(docname, None)
+    env.linkcode_stats.pop(docname, None)
+
+
+def get_outdated_linkcode_docs(app: Sphinx, env: BuildEnvironment, added: Set[str],
+                               changed: Set[str], removed: Set[str]) -> List[str]:
+    """Invalidates stored locations from source files that changed since the last build
+
+    Locations that are no longer used by any document are discarded as well
+
+    :return: the documents that link to objects from a changed source file, so they get re-read
+    """
+    used = set().union(*(
+        keys for docname, keys in env.linkcode_documents.items() if docname not in removed
+    ))
+    changed_files = set()
+
+    for path, fingerprint in list(env.linkcode_fingerprints.items()):
+        try:
+            if get_fingerprint(path) == fingerprint:
+                continue
+        except OSError:
+            pass
+        changed_files.add(path)
+        del env.linkcode_fingerprints[path]
+
+    if env.linkcode_revisions:
+        for path in get_changed_revisions(env):
+            changed_files.add(path)
+            env.linkcode_fingerprints.pop(path, None)
+
+    outdated = set()
+    for key, (path, _) in list(env.linkcode_locations.items()):
+        is_changed = path in changed_files or env.linkcode_modules.get(key) in changed_files
+        if is_changed:
+            outdated.add(key)
+        if is_changed or key not in used:
+            del env.linkcode_locations[key]
+            env.linkcode_modules.pop(key, None)
+
+    referenced = {path for path, _ in env.linkcode_locations.values()}
+    referenced.update(env.linkcode_modules.values())
+    for path in set(env.linkcode_fingerprints) - referenced:
+        del env.linkcode_fingerprints[path]
+    for path in set(env.linkcode_revisions) - set(env.linkcode_fingerprints):
+        del env.linkcode_revisions[path]
+
+    if not outdated:
+        return []
+
+    skip = changed | removed
+    return [
+        docname for docname, keys in env.linkcode_documents.items()
+        if docname not in skip and not keys.isdisjoint(outdated)
+    ]
+
+
+def merge_linkcode_env(app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment) -> None:
+    """Merges the locations resolved by a parallel read worker into the main build environment
+
+    :param docnames: the documents that were read by the worker
+    :param other: the build environment of the worker
+    """
+    for docname in docnames:
+        if docname in other.linkcode_stats:
+            env.linkcode_stats[docname] = other.linkcode_stats[docname]
+
+        keys = other.linkcode_documents.get(docname)
+        if keys is None:
+            continue
+
+        env.linkcode_documents[docname] = keys
+        for key in keys:
+            stored = other.linkcode_locations.get(key)
+            if stored is not None:
+                path = stored[0]
+                env.linkcode_locations[key] = stored
+                env.linkcode_fingerprints[path] = other.linkcode_fingerprints[path]
+                if path in other.linkcode_revisions:
+                    env.linkcode_revisions[path] = other.linkcode_revisions[path]
+
+                module_path = other.linkcode_modules.get(key)
+                if module_path is not None:
+                    env.linkcode_modules[key] = module_path
+                    env.linkcode_fingerprints[module_path] = other.linkcode_fingerprints[module_path]
+                else:
+                    env.linkcode_modules.pop(key, None)
+
+
+def write_linkcode_report(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Logs a summary of the links resolved by :func:`linkcode_resolve`, and writes it to :confval:`linkcode_report`
+
+    Counts and timings cover every document in the build environment, as of the build that last read it
+    """
+    from sphinx_github_style import __version__
+
+    if exception is not None or not hasattr(app.env, 'linkcode_stats'):
+        return
+
+    totals = {}
+    for stats in app.env.linkcode_stats.values():
+        for status, value in stats.items():
+            totals[status] = totals.get(status, 0) + value
+
+    resolve_time = totals.pop('time', 0.0)
+    report = {
+        'version': __version__,
+        'documents': len(app.env.linkcode_stats),
+        'resolved': totals.pop('resolved', 0),
+        'cached': totals.pop('cached', 0),
+        'skipped': dict(sorted(totals.items())),
+        'resolve_time': round(resolve_time, 6),
+    }
+    logger.verbose(
+        f"sphinx-github-style: {report['resolved']} links resolved, {report['cached']} cached, "
+        f"{sum(report['skipped'].values())} skipped in {resolve_time:.3f}s"
+    )
+
+    filename = app.config.linkcode_report
+    if filename:
+        path = os.path.join(app.outdir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,181 @@
+import os
+import zlib
+from typing import IO, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+from sphinx.util import logging
+from sphinx.application import Sphinx
+from sphinx.errors import ExtensionError
+from sphinx_github_style.utils.git import get_repo_dir
+from sphinx_github_style.utils.linkcode import LinkcodeUrl, get_root_index
+from sphinx_github_style.utils.roots import normalize_path
+from sphinx_github_style.linkcode_env import LinkcodeKey
+
+logger = logging.getLogger(__name__)
+
+#: The name of the manifest file in the output directory
+MANIFEST_FILENAME = 'linkcode.inv'
+
+#: The first line of every manifest
+MANIFEST_HEADER = '# Sphinx linkcode manifest version 1'
+
+
+class ManifestEntry(NamedTuple):
+    """The source code location of an object in a :class:`LinkcodeManifest`"""
+
+    filepath: str  #: The path of the source file, relative to the root of its repository
+    linestart: int  #: The first line of the object's source code
+    linestop: int  #: The last line of the object's source code
+    revision: Optional[str]  #: The revision that's linked to, if known
+    url: str  #: The template URL of the repository, as returned by :func:`~.get_linkcode_url`
+
+    def get_link(self) -> str:
+        """Returns the link to the object's source code"""
+        return self.url.format(filepath=self.filepath, linestart=self.linestart, linestop=self.linestop)
+
+
+class LinkcodeManifest(NamedTuple):
+    """The contents of a manifest written by :func:`write_linkcode_manifest`"""
+
+    project: str  #: The name of the documented project
+    version: str  #: The version of the documented project
+    objects: Dict[LinkcodeKey, ManifestEntry]  #: Mapping of each object's ``(module, fullname)`` to its location
+
+    def get_link(self, module: str, fullname: str) -> Optional[str]:
+        """Returns the link to an object's source code, or ``None`` if it isn't in the manifest
+
+        :param module: the name of the module the object is documented in
+        :param fullname: the qualified name of the object within the module
+        """
+        entry = self.objects.get((module, fullname))
+        return entry.get_link() if entry else None
+
+
+def dump_linkcode_manifest(objects: Iterable[Tuple[LinkcodeKey, ManifestEntry]], stream: IO[bytes],
+                           project: str = '', version: str = '') -> None:
+    """Writes a manifest of source code locations to a binary stream
+
+    Like ``objects.inv``, the manifest starts with a plain text header, followed by a zlib-compressed body.
+    Each repository is listed once per revision, as ``@{id} {revision} {url}``, followed by a line for each object
+    in the form ``{module} {fullname} {id} {linestart} {linestop} {filepath}``
+
+    :param objects: the ``(module, fullname)`` and :class:`ManifestEntry` of each object
+    :param stream: the stream to write to
+    :param project: the name of the documented project
+    :param version: the version of the documented project
+    """
+    repos = {}
+    lines = []
+
+    for (module, fullname), entry in sorted(objects):
+        repo = (entry.revision or '-', entry.url)
+        if repo not in repos:
+            repos[repo] = len(repos)
+            lines.append(f"@{repos[repo]} {repo[0]} {repo[1]}")
+        lines.append(f"{module} {fullname} {repos[repo]} {entry.linestart} {entry.linestop} {entry.filepath}")
+
+    header = (
+        f"{MANIFEST_HEADER}\n"
+        f"# Project: {project}\n"
+        f"# Version: {version}\n"
+        f"# The remainder of this file is compressed using zlib.\n"
+    )
+    stream.write(header.encode('utf-8'))
+    stream.write(zlib.compress('\n'.join(lines).encode('utf-8'), 9))
+
+
+def load_linkcode_manifest(source: Union[str, os.PathLike, IO[bytes]]) -> LinkcodeManifest:
+    """Loads a manifest written by :func:`write_linkcode_manifest`
+
+    For example, to link to the source code of a dependency that publishes its manifest:
+
+    .. code-block:: python
+
+       from urllib.request import urlopen
+       from sphinx_github_style.linkcode_manifest import load_linkcode_manifest
+
+       with urlopen("https://example.com/docs/linkcode.inv") as f:
+           manifest = load_linkcode_manifest(f)
+
+       manifest.get_link("package.module", "Class.method")
+
+    :param source: the path of the manifest, or a binary stream to read it from
+    :raises ValueError: if the source isn't a manifest, or is corrupted
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return load_linkcode_manifest(f)
+
+    header = {}
+    if source.readline().decode('utf-8').rstrip() != MANIFEST_HEADER:
+        raise ValueError("not a linkcode manifest, or an unsupported version")
+
+    for _ in range(3):
+        key, _, value = source.readline().decode('utf-8')[2:].rstrip('\n').partition(': ')
+        header[key] = value
+
+    try:
+        body = zlib.decompress(source.read()).decode('utf-8')
+    except zlib.error as e:
+        raise ValueError(f"corrupted linkcode manifest: {e}") from e
+
+    repos = {}
+    objects = {}
+    for line in body.splitlines():
+        if line.startswith('@'):
+            repo_id, revision, url = line[1:].split(' ', 2)
+            repos[repo_id] = (None if revision == '-' else revision, url)
+            continue
+        module, fullname, repo_id, linestart, linestop, filepath = line.split(' ', 5)
+        objects[(module, fullname)] = ManifestEntry(filepath, int(linestart), int(linestop), *repos[repo_id])
+
+    return LinkcodeManifest(header.get('Project', ''), header.get('Version', ''), objects)
+
+
+def write_linkcode_manifest(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Writes a manifest of the source code location of every linked object to the output directory
+
+    Enabled by :confval:`linkcode_manifest`. The manifest can be loaded with :func:`load_linkcode_manifest`
+    """
+    if exception is not None or not app.config.linkcode_manifest:
+        return
+    if not getattr(app.env, 'linkcode_locations', None):
+        return
+
+    try:
+        repo_dir = get_repo_dir()
+        roots = get_root_index(app, repo_dir, LinkcodeUrl(app))
+    except (ExtensionError, RuntimeError) as e:
+        logger.warning(f"sphinx-github-style: unable to write the linkcode manifest: {e}", type='linkcode')
+        return
+
+    used = set().union(*app.env.linkcode_documents.values())
+    skipped = set()
+    objects = []
+
+    for key, (path, location) in app.env.linkcode_locations.items():
+        root = location.root or normalize_path(repo_dir)
+        if key not in used or root in skipped:
+            continue
+
+        url = roots.get_url(root)
+        try:
+            if isinstance(url, LinkcodeUrl):
+                revision = url.get_revision(location.filepath)
+                repo = (revision, url.get_url(revision))
+            elif url:
+                repo = (None, url)
+            else:
+                skipped.add(root)
+                continue
+        except ExtensionError as e:
+            logger.warning(f"sphinx-github-style: unable to add links to {root} to the manifest: {e}",
+                           type='linkcode')
+            skipped.add(root)
+            continue
+
+        objects.append((key, ManifestEntry(location.filepath, location.linestart, location.linestop, *repo)))
+
+    with open(os.path.join(app.outdir, MANIFEST_FILENAME), 'wb') as f:
+        dump_linkcode_manifest(objects, f, app.config.project, app.config.version)
+
+    logger.verbose(f"sphinx-github-style: wrote the source code locations of {len(objects)} objects to "
+                   f"{MANIFEST_FILENAME}")
@@ -0,0 +1,60 @@
+import os
+from weakref import WeakKeyDictionary
+from typing import Optional
+from concurrent.futures import Executor, ProcessPoolExecutor
+from sphinx.util import logging
+from sphinx.application import Sphinx
+
+logger = logging.getLogger(__name__)
+
+#: The pool that each application's source files are being parsed in
+_executors: "WeakKeyDictionary[Sphinx, Executor]" = WeakKeyDictionary()
+
+
+def get_prefetch_workers() -> int:
+    """Returns the number of worker processes to parse source files with, leaving one core for Sphinx"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def start_linkcode_prefetch(app: Sphinx) -> None:
+    """Starts parsing the source files of the packages in :confval:`linkcode_prefetch` in a pool of worker processes
+
+    The files are parsed while Sphinx reads the documents, so that :func:`linkcode_resolve` finds their
+    locations already indexed instead of parsing each file the first time one of its objects is linked.
+    Only supported by the default ``linkcode_resolve`` function, and only runs for HTML builders,
+    since links aren't resolved by any other builder
+    """
+    modnames = app.config.linkcode_prefetch
+    if not modnames or getattr(app.builder, 'format', None) != 'html':
+        return
+
+    prefetch = getattr(app.config.linkcode_resolve, 'prefetch', None)
+    if prefetch is None:
+        logger.warning(
+            "sphinx-github-style: ``linkcode_prefetch`` is only supported by the default ``linkcode_resolve``",
+            type='linkcode', subtype='prefetch')
+        return
+
+    if isinstance(modnames, str):
+        modnames = [modnames]
+
+    executor = ProcessPoolExecutor(max_workers=get_prefetch_workers())
+    try:
+        submitted = prefetch(modnames, executor)
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+
+    if not submitted:
+        executor.shutdown(wait=False)
+        return
+
+    _executors[app] = executor
+    logger.verbose(f"sphinx-github-style: prefetching the locations of {submitted} source files")
+
+
+def stop_linkcode_prefetch(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Shuts down the pool started by :func:`start_linkcode_prefetch`, cancelling any files that weren't parsed"""
+    executor = _executors.pop(app, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sphinx.util import logging
+from sphinx.application import Sphinx
+from sphinx.errors import ExtensionError
+from sphinx_github_style.utils.git import GitCatFile, GitError, get_repo_dir
+from sphinx_github_style.utils.linkcode import LinkcodeUrl, get_root_index
+from sphinx_github_style.utils.roots import normalize_path
+from sphinx_github_style.utils.locations import SourceLocation
+from sphinx_github_style.linkcode_env import LinkcodeKey
+
+logger = logging.getLogger(__name__)
+
+
+def get_linked_objects(app: Sphinx) -> Dict[Tuple[Optional[str], str], List[Tuple[LinkcodeKey, str, SourceLocation]]]:
+    """Returns the objects that documents currently link to, grouped by the file they link to
+
+    :return: mapping of each linked file, as its root directory and path relative to the root,
+       to the ``(module, fullname)``, absolute path and :class:`~.SourceLocation` of its linked objects
+    """
+    env = app.env
+    used = set().union(*env.linkcode_documents.values())
+    linked = {}
+
+    for key, (path, location) in env.linkcode_locations.items():
+        if key in used:
+            linked.setdefault((location.root, location.filepath), []).append((key, path, location))
+    return linked
+
+
+def check_location(location: SourceLocation, blob: bytes, path: str) -> Optional[str]:
+    """Checks that a linked line range exists in a blob and matches the working tree
+
+    :param location: the linked location
+    :param blob: the contents of the linked file at the linked revision
+    :param path: the absolute path of the file in the working tree
+    :return: the reason the link is invalid, or ``None`` if it's valid
+    """
+    blob_lines = blob.splitlines()
+    if location.linestop > len(blob_lines):
+        return f"the file only has {len(blob_lines)} lines"
+
+    try:
+        with open(path, 'rb') as f:
+            worktree_lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    lines = slice(location.linestart - 1, location.linestop)
+    if blob_lines[lines] != worktree_lines[lines]:
+        return "the lines differ from the working tree"
+    return None
+
+
+def validate_linkcode_links(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Checks every link generated by :func:`linkcode_resolve` against the local repository
+
+    Enabled by :confval:`linkcode_validate`. For each linked file, the blob at the linked revision is read
+    through a single ``git cat-file --batch`` process per repository, then each linked line range is checked to
+    exist and match the working tree. A warning is logged for every invalid link, with the name of the
+    linked object, the object name of the blob, and the first document that links to it
+    """
+    if exception is not None or not app.config.linkcode_validate:
+        return
+    if not getattr(app.env, 'linkcode_locations', None):
+        return
+
+    try:
+        repo_dir = get_repo_dir()
+        roots = get_root_index(app, repo_dir, LinkcodeUrl(app))
+    except (ExtensionError, RuntimeError) as e:
+        logger.warning(f"sphinx-github-style: unable to validate links: {e}", type='linkcode', subtype='validate')
+        return
+
+    docnames = {}
+    for docname, keys in sorted(app.env.linkcode_documents.items()):
+        for key in keys:
+            docnames.setdefault(key, docname)
+
+    by_root = {}
+    for (root, filepath), objects in get_linked_objects(app).items():
+        by_root.setdefault(root or normalize_path(repo_dir), {})[filepath] = objects
+
+    total = invalid = 0
+    for root, linked in sorted(by_root.items()):
+        linkcode_url = roots.get_url(root)
+        if not isinstance(linkcode_url, LinkcodeUrl):
+            logger.warning(
+                f"sphinx-github-style: unable to validate links to {root}: not in ``linkcode_roots``",
+                type='linkcode', subtype='validate'
+            )
+            continue
+        try:
+            with GitCatFile(Path(root)) as cat_file:
+                for filepath, objects in sorted(linked.items()):
+                    name = f"{linkcode_url.get_revision(filepath)}:{filepath}"
+                    obj = cat_file.get(name)
+
+                    for key, path, location in sorted(objects):
+                        total += 1
+                        if obj is None or obj[1] != 'blob':
+                            reason = f"{name} doesn't exist"
+                        else:
+                            reason = check_location(location, obj[2], path)
+                            if reason is None:
+                                continue
+                            reason = f"{name} ({obj[0]}): {reason}"
+
+                        invalid += 1
+                        logger.warning(
+                            f"sphinx-github-style: invalid link for {'.'.join(key)} "
+                            f"to lines {location.linestart}-{location.linestop}: {reason}",
+                            location=docnames.get(key), type='linkcode', subtype='validate'
+                        )
+
+        except (ExtensionError, GitError) as e:
+            logger.warning(
+                f"sphinx-github-style: unable to validate links to {root}: {e}", type='linkcode', subtype='validate'
+            )
+
+    logger.info(f"sphinx-github-style: validated {total} links in {len(by_root)} repositories, {invalid} invalid")
@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Optional
+
+#: The version of the cache format, bumped whenever the cached values change
+CACHE_VERSION = 1
+
+
+def get_blob_sha(data: bytes) -> str:
+    """Returns the git object name of a blob, as computed by ``git hash-object``
+
+    :param data: the contents of the blob
+    """
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class BlobCache:
+    """A cache of parsed source files that's shared between builds, keyed by the git blob hash of each file
+
+    Used to avoid parsing the same files again when building the documentation of several versions of a
+    project (ex. with ``sphinx-multiversion``), since most files are unchanged between versions. Cached
+    values don't include the revision, so only the files that changed are parsed by each build
+
+    Each entry is stored in its own file and written atomically, so the cache can be shared by
+    builds that run concurrently in separate processes
+
+    :param cache_dir: the directory to store the cache in
+    """
+
+    def __init__(self, cache_dir: os.PathLike):
+        self.cache_dir = Path(cache_dir, f'v{CACHE_VERSION}')
+
+    def get_path(self, sha: str, kind: str) -> Path:
+        """Returns the path of the file storing an entry
+
+        :param sha: the git blob hash of the source file
+        :param kind: the kind of value stored for the file
+        """
+        return self.cache_dir.joinpath(sha[:2], f'{sha}.{kind}.json')
+
+    def get(self, sha: str, kind: str) -> Optional[Any]:
+        """Returns a cached value, or ``None`` if it's not in the cache
+
+        :param sha: the git blob hash of the source file
+        :param kind: the kind of value stored for the file
+        """
+        try:
+            with open(self.get_path(sha, kind), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, sha: str, kind: str, value: Any) -> None:
+        """Adds a value to the cache
+
+        :param sha: the git blob hash of the source file
+        :param kind: the kind of value stored for the file
+        :param value: the value to store; must be serializable to JSON
+        """
+        path = self.get_path(sha, kind)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(value, f, separators=(',', ':'))
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
@@ -1,55 +1,618 @@
-import subprocess
+import os
+import zlib
+import heapq
+import struct
 from pathlib import Path
+from functools import lru_cache, cached_property
+from typing import Dict, List, Optional, Set, Tuple
+from sphinx.util import logging
 from sphinx.errors import ExtensionError
 
+logger = logging.getLogger(__name__)
 
-def get_head() -> str:
+#: Seconds to wait for a ``git`` subprocess before giving up (ex. in a slow, shallow CI clone)
+GIT_TIMEOUT = 30
+
+#: Pack object types, by their type number
+PACK_TYPES = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+
+
+class GitError(Exception):
+    """Raised when repository metadata can't be read directly from the ``.git`` directory"""
+
+
+class GitRepository:
+    """Reads repository metadata directly from the files in a ``.git`` directory, without running ``git``
+
+    Supports ``HEAD``, loose refs, ``packed-refs``, and loose or packed commit and tag objects
+
+    :param work_dir: the root directory of the working tree
+    :param git_dir: the ``.git`` directory of the working tree
+    """
+
+    def __init__(self, work_dir: Path, git_dir: Path):
+        self.work_dir = work_dir
+        self.git_dir = git_dir
+        self.common_dir = git_dir
+
+        # Linked worktrees keep their refs and objects in the main repository
+        commondir = git_dir.joinpath('commondir')
+        if commondir.is_file():
+            self.common_dir = git_dir.joinpath(commondir.read_text().strip()).resolve()
+
+        self.objects_dir = self.common_dir.joinpath('objects')
+
+    @cached_property
+    def packed_refs(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Maps the name of each ref in ``packed-refs`` to its SHA and peeled SHA (for annotated tags)"""
+        refs = {}
+        try:
+            lines = self.common_dir.joinpath('packed-refs').read_text().splitlines()
+        except FileNotFoundError:
+            return refs
+
+        ref = None
+        for line in lines:
+            if line.startswith('#'):
+                continue
+            if line.startswith('^') and ref:
+                refs[ref] = (refs[ref][0], line[1:].strip())
+            else:
+                sha, ref = line.split(' ', 1)
+                refs[ref] = (sha, None)
+        return refs
+
+    def read_ref(self, ref: str) -> str:
+        """Returns the SHA that a ref points to, following symbolic refs
+
+        :param ref: the full name of the ref, ex. ``"HEAD"`` or ``"refs/heads/master"``
+        :raises GitError: if the ref doesn't exist
+        """
+        for _ in range(10):
+            for base in (self.git_dir, self.common_dir):
+                path = base.joinpath(ref)
+                if path.is_file():
+                    value = path.read_text().strip()
+                    break
+            else:
+                if ref in self.packed_refs:
+                    return self.packed_refs[ref][0]
+                raise GitError(f"Ref not found: {ref}")
+
+            if not value.startswith('ref:'):
+                return value
+            ref = value[4:].strip()
+
+        raise GitError(f"Too many levels of symbolic refs: {ref}")
+
+    @cached_property
+    def head_commit(self) -> str:
+        """The SHA of the currently checked out commit"""
+        return self.read_ref('HEAD')
+
+    @cached_property
+    def shallow(self) -> Set[str]:
+        """The commits whose parents are missing from a shallow clone"""
+        try:
+            return set(self.common_dir.joinpath('shallow').read_text().split())
+        except FileNotFoundError:
+            return set()
+
+    @cached_property
+    def packed_refs_peeled(self) -> bool:
+        """Whether ``packed-refs`` lists the peeled SHA of every annotated tag, so tags without one are lightweight"""
+        try:
+            with open(self.common_dir.joinpath('packed-refs')) as f:
+                header = f.readline()
+        except FileNotFoundError:
+            return False
+        return header.startswith('# pack-refs with:') and 'peeled' in header.split(':', 1)[1].split()
+
+    @cached_property
+    def tag_refs(self) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+        """Maps each tagged commit to its tags, as ``(name, tag object SHA)``
+
+        The SHA is ``None`` for lightweight tags. Tags in ``packed-refs`` are peeled using its ``^{sha}`` lines, so only
+        loose tags (and packed tags from a ``packed-refs`` file without peeled lines) are read from the object store
+        """
+        refs = {}
+        for ref, (sha, peeled) in self.packed_refs.items():
+            if ref.startswith('refs/tags/'):
+                if peeled:
+                    refs[ref] = (peeled, sha)
+                elif self.packed_refs_peeled:
+                    refs[ref] = (sha, None)
+                else:
+                    refs[ref] = (sha, False)
+
+        tags_dir = self.common_dir.joinpath('refs', 'tags')
+        for root, _, files in os.walk(tags_dir):
+            for file in files:
+                path = Path(root, file)
+                refs['refs/' + path.relative_to(tags_dir.parent).as_posix()] = (path.read_text().strip(), False)
+
+        tags = {}
+        for ref, (sha, tag) in sorted(refs.items()):
+            if tag is False:  # Not known to be peeled
+                tag = None
+                obj_type, data = self.read_object(sha)
+                if obj_type == 'tag':
+                    tag = sha
+                while obj_type == 'tag':
+                    sha = parse_headers(data)['object']
+                    obj_type, data = self.read_object(sha)
+                if obj_type != 'commit':
+                    continue
+            tags.setdefault(sha, []).append((ref[len('refs/tags/'):], tag))
+        return tags
+
+    def get_tag(self, sha: str) -> Optional[str]:
+        """Returns the name of the tag that points to a commit, or ``None`` if it isn't tagged
+
+        Uses the same preference as ``git describe`` when several tags point to the same commit:
+        annotated tags win over lightweight tags, and the most recent annotated tag wins over the others.
+        Tag objects are only read to break a tie between annotated tags
+
+        :param sha: the SHA of the commit
+        """
+        candidates = self.tag_refs.get(sha)
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0][0]
+
+        annotated = [(name, tag) for name, tag in candidates if tag]
+        if not annotated:
+            return candidates[0][0]
+        if len(annotated) == 1:
+            return annotated[0][0]
+
+        def get_tagger_timestamp(candidate):
+            return get_timestamp(parse_headers(self.read_object(candidate[1])[1]).get('tagger', ''))
+
+        return max(annotated, key=get_tagger_timestamp)[0]
+
+    def describe_head(self) -> str:
+        """Returns the tag of the ``HEAD`` commit if it's tagged, otherwise its SHA"""
+        return self.get_tag(self.head_commit) or self.head_commit
+
+    def get_last_tag(self) -> Optional[str]:
+        """Returns the most recent tag reachable from the ``HEAD`` commit
+
+        Commits are walked from newest to oldest, stopping at the boundary of a shallow clone
+
+        :raises GitError: if the walk reaches a commit that isn't in the repository (ex. in a shallow clone)
+        """
+        tags = self.tag_refs
+        if not tags:
+            return None
+
+        head = self.head_commit
+        queue, seen = [(0, head)], {head}
+
+        while queue:
+            _, sha = heapq.heappop(queue)
+            if sha in tags:
+                return self.get_tag(sha)
+            if sha in self.shallow:
+                continue
+
+            _, data = self.read_object(sha)
+            for parent in parse_headers(data, multi=('parent',)).get('parent', []):
+                if parent not in seen:
+                    seen.add(parent)
+                    _, parent_data = self.read_object(parent)
+                    timestamp = get_timestamp(parse_headers(parent_data).get('committer', ''))
+                    heapq.heappush(queue, (-timestamp, parent))
+        return None
+
+    def read_object(self, sha: str) -> Tuple[str, bytes]:
+        """Returns the type and contents of an object from the object store
+
+        :param sha: the SHA of the object
+        :raises GitError: if the object doesn't exist or can't be read
+        """
+        path = self.objects_dir.joinpath(sha[:2], sha[2:])
+        try:
+            raw = zlib.decompress(path.read_bytes())
+        except FileNotFoundError:
+            return self.read_packed_object(bytes.fromhex(sha))
+        except zlib.error as e:
+            raise GitError(f"Corrupt object: {sha}") from e
+
+        header, _, data = raw.partition(b'\0')
+        return header.split(b' ')[0].decode(), data
+
+    @cached_property
+    def packs(self) -> List[Tuple[bytes, Path]]:
+        """The contents of each pack index, along with the path of its pack file"""
+        return [
+            (idx.read_bytes(), idx.with_suffix('.pack'))
+            for idx in sorted(self.objects_dir.joinpath('pack').glob('*.idx'))
+        ]
+
+    def read_packed_object(self, sha: bytes) -> Tuple[str, bytes]:
+        """Returns the type and contents of an object stored in a pack file
+
+        :param sha: the binary SHA of the object
+        """
+        for idx, pack in self.packs:
+            offset = find_pack_offset(idx, sha)
+            if offset is not None:
+                with open(pack, 'rb') as f:
+                    return self._read_pack_entry(f, offset)
+
+        raise GitError(f"Object not found: {sha.hex()}")
+
+    def _read_pack_entry(self, f, offset: int) -> Tuple[str, bytes]:
+        f.seek(offset)
+        byte = f.read(1)[0]
+        type_num = (byte >> 4) & 7
+
+        while byte & 0x80:
+            byte = f.read(1)[0]
+
+        if type_num == 6:  # OFS_DELTA
+            byte = f.read(1)[0]
+            base_offset = byte & 0x7f
+            while byte & 0x80:
+                byte = f.read(1)[0]
+                base_offset = ((base_offset + 1) << 7) | (byte & 0x7f)
+            delta = read_zlib(f)
+            base_type, base = self._read_pack_entry(f, offset - base_offset)
+            return base_type, apply_delta(base, delta)
+
+        if type_num == 7:  # REF_DELTA
+            base_sha = f.read(20)
+            delta = read_zlib(f)
+            base_type, base = self.read_object(base_sha.hex())
+            return base_type, apply_delta(base, delta)
+
+        if type_num not in PACK_TYPES:
+            raise GitError(f"Unknown pack object type: {type_num}")
+
+        return PACK_TYPES[type_num], read_zlib(f)
+
+
+def parse_headers(data: bytes, multi: Tuple[str, ...] = ()) -> Dict:
+    """Parses the headers of a commit or tag object
+
+    :param data: the contents of the object
+    :param multi: the names of headers that can appear more than once, which are returned as lists
+    """
+    headers = {}
+    for line in data.split(b'\n'):
+        if not line:
+            break
+        if line.startswith(b' '):  # Continuation of a multi-line header (ex. gpgsig)
+            continue
+        key, _, value = line.decode('utf-8', 'replace').partition(' ')
+        if key in multi:
+            headers.setdefault(key, []).append(value)
+        else:
+            headers.setdefault(key, value)
+    return headers
+
+
+def get_timestamp(signature: str) -> int:
+    """Returns the timestamp from an author, committer, or tagger signature"""
+    try:
+        return int(signature.rsplit(' ', 2)[-2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def find_pack_offset(idx: bytes, sha: bytes) -> Optional[int]:
+    """Returns the offset of an object in a pack file, using a version 2 pack index
+
+    :param idx: the contents of the pack index
+    :param sha: the binary SHA of the object
+    """
+    if idx[:8] != b'\377tOc\0\0\0\2':
+        raise GitError("Unsupported pack index version")
+
+    first = sha[0]
+    lo = struct.unpack_from('>I', idx, 8 + 4 * (first - 1))[0] if first else 0
+    hi = struct.unpack_from('>I', idx, 8 + 4 * first)[0]
+    count = struct.unpack_from('>I', idx, 8 + 4 * 255)[0]
+    shas = 8 + 1024
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        entry = idx[shas + 20 * mid: shas + 20 * mid + 20]
+        if entry < sha:
+            lo = mid + 1
+        elif entry > sha:
+            hi = mid
+        else:
+            offsets = shas + 24 * count
+            offset = struct.unpack_from('>I', idx, offsets + 4 * mid)[0]
+            if offset & 0x80000000:
+                large = offsets + 4 * count + 8 * (offset & 0x7fffffff)
+                offset = struct.unpack_from('>Q', idx, large)[0]
+            return offset
+    return None
+
+
+def read_zlib(f) -> bytes:
+    """Decompresses the zlib stream that starts at the current position of a file"""
+    decompressor = zlib.decompressobj()
+    data = []
+    while not decompressor.eof:
+        chunk = f.read(4096)
+        if not chunk:
+            raise GitError("Truncated pack file")
+        data.append(decompressor.decompress(chunk))
+    return b''.join(data)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Applies a pack file delta to the contents of its base object"""
+    pos = 0
+    for _ in range(2):  # Skip the base and result sizes
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+
+    result = []
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:  # Copy from base
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (1 << (4 + i)):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            result.append(base[offset: offset + (size or 0x10000)])
+        elif op:  # Insert new data
+            result.append(delta[pos: pos + op])
+            pos += op
+        else:
+            raise GitError("Invalid delta opcode")
+    return b''.join(result)
+
+
+def find_repository(path: Optional[Path] = None) -> Optional[GitRepository]:
+    """Returns the :class:`GitRepository` containing a directory, or ``None`` if it's not in a repository
+
+    The result is memoized per repository, so metadata is only read once
+
+    :param path: the directory to search from; defaults to the current working directory
+    """
+    path = Path(path or os.getcwd()).resolve()
+
+    for directory in (path, *path.parents):
+        dotgit = directory.joinpath('.git')
+        if dotgit.is_dir():
+            return load_repository(str(directory), str(dotgit))
+        if dotgit.is_file():  # Linked worktree or submodule
+            content = dotgit.read_text().strip()
+            if content.startswith('gitdir:'):
+                git_dir = directory.joinpath(content[len('gitdir:'):].strip()).resolve()
+                return load_repository(str(directory), str(git_dir))
+    return None
+
+
+@lru_cache(maxsize=None)
+def load_repository(work_dir: str, git_dir: str) -> GitRepository:
+    """Returns the memoized :class:`GitRepository` for a working tree and its ``.git`` directory"""
+    return GitRepository(Path(work_dir), Path(git_dir))
+
+
+def run_git(cmd: str, cwd: Optional[Path] = None) -> str:
+    """Runs a ``git`` command and returns its output
+
+    :param cwd: the directory to run the command in; defaults to the current working directory
+    :raises GitError: if the command fails, times out, or ``git`` isn't installed
+    """
+    import subprocess
+
+    try:
+        return subprocess.check_output(
+            cmd.split(" "), cwd=cwd, timeout=GIT_TIMEOUT, stderr=subprocess.DEVNULL
+        ).strip().decode('utf-8')
+
+    except (OSError, subprocess.SubprocessError) as e:
+        raise GitError(f"Command failed: {cmd}") from e
+
+
+class GitCatFile:
+    """Reads objects from a repository through a single long-running ``git cat-file --batch`` process
+
+    Use as a context manager, so the process is closed when you're done::
+
+        with GitCatFile(repo_dir) as cat_file:
+            blob = cat_file.get("v1.0.0:README.rst")
+
+    :param work_dir: the directory to run ``git`` in
+    """
+
+    def __init__(self, work_dir: Path):
+        self.work_dir = work_dir
+        self.process = None
+
+    def __enter__(self) -> "GitCatFile":
+        import subprocess
+
+        try:
+            self.process = subprocess.Popen(
+                ["git", "cat-file", "--batch"], cwd=self.work_dir,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise GitError("Command failed: git cat-file --batch") from e
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        import subprocess
+
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=GIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+    def get(self, name: str) -> Optional[Tuple[str, str, bytes]]:
+        """Reads an object from the repository
+
+        :param name: any object name accepted by ``git``, ex. ``"{revision}:{filepath}"``
+        :return: the object's SHA, type and contents, or ``None`` if it doesn't exist
+        :raises GitError: if the process exited or returned an invalid response
+        """
+        if self.process is None:
+            raise GitError("git cat-file --batch isn't running")
+        if "\n" in name:
+            return None
+        try:
+            self.process.stdin.write(name.encode('utf-8') + b"\n")
+            self.process.stdin.flush()
+            header = self.process.stdout.readline().decode('utf-8').split()
+        except OSError as e:
+            raise GitError("git cat-file --batch exited unexpectedly") from e
+
+        if len(header) == 2 and header[1] in ("missing", "ambiguous"):
+            return None
+        if len(header) != 3:
+            raise GitError(f"Invalid response from git cat-file --batch: {' '.join(header)!r}")
+
+        sha, obj_type, size = header
+        contents = self.process.stdout.read(int(size) + 1)[:-1]
+        return sha, obj_type, contents
+
+
+def get_head(path: Optional[Path] = None) -> str:
     """Gets the most recent commit hash or tag
 
+    :param path: a directory in the repository; defaults to the current working directory
     :return: The SHA or tag name of the most recent commit, or "master" if the call to git fails.
     """
+    try:
+        repo = find_repository(path)
+        if repo is not None:
+            return repo.describe_head()
+    except (GitError, OSError, ValueError):
+        pass
+
     cmd = "git log -n1 --pretty=%H"
     try:
         # get most recent commit hash
-        head = subprocess.check_output(cmd.split()).strip().decode('utf-8')
+        head = run_git(cmd, cwd=path)
 
         # if head is a tag, use tag as reference
         cmd = "git describe --exact-match --tags " + head
         try:
-            tag = subprocess.check_output(cmd.split(" ")).strip().decode('utf-8')
+            tag = run_git(cmd, cwd=path)
             return tag
 
-        except subprocess.CalledProcessError:
+        except GitError:
             return head
 
-    except subprocess.CalledProcessError:
-        print("Failed to get head")  # so no head?
+    except GitError:
+        logger.info("sphinx-github-style: failed to get head, using \"master\"")  # so no head?
         return "master"
 
 
-def get_last_tag() -> str:
+def get_last_tag(path: Optional[Path] = None) -> str:
     """Get the most recent commit tag on the currently checked out branch
 
+    :param path: a directory in the repository; defaults to the current working directory
     :raises ExtensionError: if no tags exist on the branch
     """
+    try:
+        repo = find_repository(path)
+        if repo is not None:
+            tag = repo.get_last_tag()
+            if tag is None:
+                raise ExtensionError("``sphinx-github-style``: no tags found on current branch")
+            return tag
+    except (GitError, OSError, ValueError):
+        pass
+
     try:
         cmd = "git describe --tags --abbrev=0"
-        return subprocess.check_output(cmd.split(" ")).strip().decode('utf-8')
+        return run_git(cmd, cwd=path)
 
-    except subprocess.CalledProcessError:
+    except GitError:
         raise ExtensionError("``sphinx-github-style``: no tags found on current branch")
 
 
+def get_file_revisions(path: Optional[Path] = None, pathspec: str = '*.py') -> Dict[str, str]:
+    """Returns the last commit that modified each tracked file, from a single ``git log`` walk
+
+    The history is walked from ``HEAD``, following only the first parent of merge commits, so changes merged
+    from another branch are attributed to the merge commit. The walk stops once every tracked file has been seen
+
+    :param path: a directory in the repository; defaults to the current working directory
+    :param pathspec: the files to include, relative to the root of the repository
+    :return: mapping of the ``/``-separated path of each file, relative to the root of the repository,
+       to the SHA of the last commit that modified it
+    :raises GitError: if the files or history can't be read
+    """
+    import subprocess
+
+    top = f':(top){pathspec}'
+    tracked = set(run_git(f"git -c core.quotePath=false ls-files -z --full-name -- {top}", cwd=path).split('\0'))
+    tracked.discard('')
+    if not tracked:
+        return {}
+
+    cmd = ["git", "-c", "core.quotePath=false", "log", "--first-parent", "-m",
+           "--name-only", "--format=%x00%H", "HEAD", "--", top]
+    try:
+        process = subprocess.Popen(cmd, cwd=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        raise GitError(f"Command failed: {' '.join(cmd)}") from e
+
+    revisions = {}
+    commit = None
+    try:
+        for line in process.stdout:
+            line = line.rstrip(b'\n').decode('utf-8', 'replace')
+            if line.startswith('\0'):
+                commit = line[1:]
+            elif line in tracked and line not in revisions:
+                revisions[line] = commit
+                if len(revisions) == len(tracked):
+                    break
+    finally:
+        finished = process.poll() is not None or len(revisions) != len(tracked)
+        process.stdout.close()
+        if not finished:
+            process.kill()
+        process.wait()
+
+    if finished and process.returncode != 0:
+        raise GitError(f"Command failed: {' '.join(cmd)}")
+    return revisions
+
+
 def get_repo_dir() -> Path:
     """Returns the root directory of the repository
 
     :return: A Path object representing the working directory of the repository.
     """
+    repo = find_repository()
+    if repo is not None:
+        return repo.work_dir
+
     try:
         cmd = "git rev-parse --show-toplevel"
-        repo_dir = Path(subprocess.check_output(cmd.split(" ")).strip().decode('utf-8'))
+        repo_dir = Path(run_git(cmd))
 
-    except subprocess.CalledProcessError as e:
+    except GitError as e:
         raise RuntimeError("Unable to determine the repository directory") from e
 
     return repo_dir
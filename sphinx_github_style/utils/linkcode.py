@@ -1,27 +1,50 @@
+import os
 import sys
-import inspect
+import time
+import importlib.util
 from pathlib import Path
+from concurrent.futures import Executor
 from functools import cached_property
+from sphinx.application import Sphinx
 from sphinx.errors import ExtensionError
-from typing import Dict, Optional, Callable
+from typing import Dict, Iterable, List, Optional, Callable, Tuple, Union
+from sphinx.util import logging
+from sphinx_github_style.utils.sphinx import get_conf_val
 from sphinx_github_style.utils.git import get_head, get_last_tag, get_repo_dir
+from sphinx_github_style.utils.locations import (
+    LocationIndex, SourceLocation, get_source_file, inspect_location, walk_package
+)
+from sphinx_github_style.utils.static import StaticIndex
+from sphinx_github_style.utils.roots import RootIndex
+from sphinx_github_style.utils.blob_cache import BlobCache
+from sphinx_github_style.utils import registry
+from sphinx_github_style.linkcode_env import (
+    get_linkcode_location, set_linkcode_location, set_linkcode_revision, record_linkcode_stat
+)
 
+logger = logging.getLogger(__name__)
 
-def get_linkcode_revision(blob: str) -> str:
+
+def get_linkcode_revision(blob: str, repo_dir: Optional[Path] = None) -> str:
     """Get the blob to link to on GitHub
 
     .. note::
 
-       The value of ``blob`` can be any of ``"head"``, ``"last_tag"``, or ``"{blob}"``
+       The value of ``blob`` can be any of ``"head"``, ``"last_commit"``, ``"last_tag"``, or ``"{blob}"``
 
        * ``head`` (default): links to the most recent commit hash; if this commit is tagged, uses the tag instead
+       * ``last_commit``: links each file to the last commit that modified it (see :meth:`LinkcodeUrl.get_revision`);
+         returns the same revision as ``head``, which is used for files that haven't been committed
        * ``last_tag``: links to the most recent commit tag on the currently checked out branch
        * ``blob``: links to any blob you want, for example ``"master"`` or ``"v2.0.1"``
+
+    :param blob: The blob to link to
+    :param repo_dir: A directory in the repository; defaults to the current working directory
     """
-    if blob == "head":
-        return get_head()
+    if blob in ("head", "last_commit"):
+        return get_head(repo_dir)
     if blob == 'last_tag':
-        return get_last_tag()
+        return get_last_tag(repo_dir)
     # Link to the branch/tree/blob you provided, ex. "master"
     return blob
 
@@ -40,7 +63,7 @@ def get_linkcode_url(blob: Optional[str] = None, context: Optional[Dict] = None,
             raise ExtensionError(
                 "sphinx-github-style: config value ``linkcode_url`` is missing")
         else:
-            print(
+            logger.debug(
                 "sphinx-github-style: config value ``linkcode_url`` is missing. "
                 "Creating link from ``html_context`` values..."
             )
@@ -57,69 +80,317 @@ def get_linkcode_url(blob: Optional[str] = None, context: Optional[Dict] = None,
     return url + "{filepath}#L{linestart}-L{linestop}"
 
 
-def get_linkcode_resolve(linkcode_url: str, repo_dir: Optional[Path] = None) -> Callable:
+class LinkcodeUrl:
+    """Lazily determines the template URL to use for linkcode links
+
+    The revision and URL are only computed the first time a link is formatted, then cached.
+    This keeps ``git`` out of builds that never resolve a link (ex. ``-b latex`` or ``make clean``)
+
+    :param app: The Sphinx application, used to read the config values once they're initialized
+    :param url: The base URL of the repository; defaults to :confval:`linkcode_url`
+    :param blob: The blob to link to; defaults to :confval:`linkcode_blob`
+    :param repo_dir: A directory in the repository, used to determine the revision;
+       defaults to the current working directory
+    """
+
+    def __init__(self, app: Sphinx, url: Optional[str] = None, blob: Optional[str] = None,
+                 repo_dir: Optional[Path] = None):
+        self.app = app
+        self.base_url = url
+        self.blob = blob
+        self.repo_dir = repo_dir
+        self.urls: Dict[str, str] = {}
+
+    @cached_property
+    def revision(self) -> str:
+        """The revision to link to, determined from :confval:`linkcode_blob`
+
+        If :confval:`linkcode_watch` is enabled, the revision from the previous build
+        is reused until the repository changes
+        """
+        blob = self.blob or get_conf_val(self.app, 'linkcode_blob')
+        if get_conf_val(self.app, 'linkcode_watch'):
+            return registry.get_revision(blob, self.repo_dir)
+        return get_linkcode_revision(blob, self.repo_dir)
+
+    @cached_property
+    def file_revisions(self) -> Optional[Dict[str, str]]:
+        """The last commit to modify each file, if :confval:`linkcode_blob` is ``"last_commit"``, otherwise ``None``"""
+        if (self.blob or get_conf_val(self.app, 'linkcode_blob')) != 'last_commit':
+            return None
+        return registry.load_file_revisions(self.repo_dir)
+
+    @cached_property
+    def url(self) -> str:
+        """The template URL, as returned by :func:`get_linkcode_url`"""
+        return self.get_url(self.revision)
+
+    def get_revision(self, filepath: str) -> str:
+        """Returns the revision to link a file to
+
+        If :confval:`linkcode_blob` is ``"last_commit"``, this is the last commit that modified the file, so its
+        links only change when the file does. Otherwise, or if the file hasn't been committed, it's :attr:`revision`
+
+        :param filepath: the path of the file, relative to the root of the repository
+        """
+        if self.file_revisions is None:
+            return self.revision
+        return self.file_revisions.get(filepath) or self.revision
+
+    def get_url(self, revision: str) -> str:
+        """Returns the template URL for a revision, as returned by :func:`get_linkcode_url`"""
+        url = self.urls.get(revision)
+        if url is None:
+            url = self.urls[revision] = get_linkcode_url(
+                blob=revision,
+                url=self.base_url or get_conf_val(self.app, 'linkcode_url'),
+                context=get_conf_val(self.app, 'html_context'),
+            )
+        return url
+
+    def format(self, **kwargs) -> str:
+        """Formats the template URL into the final link"""
+        if self.file_revisions is None:
+            return self.url.format(**kwargs)
+        return self.get_url(self.get_revision(kwargs['filepath'])).format(**kwargs)
+
+
+def get_source_roots(app: Sphinx, repo_dir: Path) -> Optional[List[Path]]:
+    """Returns the source roots to resolve links from with :class:`~.StaticIndex`
+
+    Only used if :confval:`linkcode_static` is enabled
+
+    :param repo_dir: The root directory of the Git repository, used if :confval:`linkcode_source_roots` is empty
+    :return: The directories from :confval:`linkcode_source_roots`, relative to the configuration directory,
+       or ``None`` to resolve links by importing objects instead. If empty, the repository and
+       every directory in :confval:`linkcode_roots` are used
+    """
+    if not get_conf_val(app, 'linkcode_static'):
+        return None
+    roots = get_conf_val(app, 'linkcode_source_roots') or [repo_dir, *(get_conf_val(app, 'linkcode_roots') or {})]
+    return [Path(app.confdir, root) for root in roots]
+
+
+def get_root_index(app: Sphinx, repo_dir: Path, linkcode_url: Union[str, LinkcodeUrl]) -> RootIndex:
+    """Returns a :class:`~.RootIndex` of the repository and every additional root in :confval:`linkcode_roots`
+
+    If :confval:`linkcode_match_installed` is enabled, files outside of the roots are matched by their contents
+
+    :param repo_dir: The root directory of the Git repository
+    :param linkcode_url: The template URL (or :class:`LinkcodeUrl`) of the repository
+    :raises ExtensionError: if a root in :confval:`linkcode_roots` doesn't have a URL
+    """
+    roots = {repo_dir: linkcode_url}
+
+    for root, value in (get_conf_val(app, 'linkcode_roots') or {}).items():
+        root = Path(app.confdir, root).resolve()
+        if isinstance(value, str):
+            value = {'url': value}
+        if not value.get('url'):
+            raise ExtensionError(f"sphinx-github-style: ``linkcode_roots`` entry for {root} is missing a url")
+        roots[root] = LinkcodeUrl(app, url=value['url'], blob=value.get('blob'), repo_dir=root)
+
+    return RootIndex(roots, match_contents=bool(get_conf_val(app, 'linkcode_match_installed')))
+
+
+def get_blob_cache(app: Sphinx) -> Optional[BlobCache]:
+    """Returns the :class:`~.BlobCache` in :confval:`linkcode_cache_dir`, relative to the configuration directory
+
+    :return: the cache, or ``None`` if :confval:`linkcode_cache_dir` isn't set
+    """
+    cache_dir = get_conf_val(app, 'linkcode_cache_dir')
+    return BlobCache(Path(app.confdir, os.path.expanduser(cache_dir))) if cache_dir else None
+
+
+def get_state_key(app: Sphinx) -> Tuple:
+    """Returns the key of the :class:`~.LinkcodeState` to reuse between builds when :confval:`linkcode_watch` is enabled
+
+    Consists of the config values that determine which files are parsed and how, so the state is
+    only reused by builds of the same project with the same configuration
+    """
+    return (
+        os.getcwd(), str(app.confdir),
+        repr(get_conf_val(app, 'linkcode_roots')),
+        bool(get_conf_val(app, 'linkcode_static')),
+        repr(get_conf_val(app, 'linkcode_source_roots')),
+        bool(get_conf_val(app, 'linkcode_match_installed')),
+        get_conf_val(app, 'linkcode_cache_dir'),
+    )
+
+
+def get_linkcode_resolve(linkcode_url: Union[str, LinkcodeUrl], repo_dir: Optional[Path] = None,
+                         app: Optional[Sphinx] = None, source_roots: Optional[List[Path]] = None,
+                         roots: Optional[RootIndex] = None, cache: Optional[BlobCache] = None) -> Callable:
     """Defines and returns a ``linkcode_resolve`` function for your package
 
     Used by default if ``linkcode_resolve`` isn't defined in ``conf.py``
 
-    :param linkcode_url: The template URL to use when resolving cross-references with :mod:`sphinx.ext.linkcode`
-    :param repo_dir: The root directory of the Git repository.
+    :param linkcode_url: The template URL to use when resolving cross-references with :mod:`sphinx.ext.linkcode`,
+       or a :class:`LinkcodeUrl` to determine it once the first link is resolved
+    :param repo_dir: The root directory of the Git repository; determined on the first call if not provided
+    :param app: The Sphinx application; if provided, resolved locations are stored in the build environment
+       and reused by incremental builds until their source file changes
+    :param source_roots: The directories containing your top-level packages; if provided, source files are
+       parsed with a :class:`~.StaticIndex` instead of importing modules. If not provided but ``app`` is,
+       determined from :confval:`linkcode_static` and :confval:`linkcode_source_roots` on the first call
+    :param roots: A :class:`~.RootIndex` mapping each repository to its template URL, if source files are spread
+       across several repositories. If not provided but ``app`` is, determined from :confval:`linkcode_roots`
+    :param cache: A :class:`~.BlobCache` to share parsed source files with other builds. If not provided but
+       ``app`` is, determined from :confval:`linkcode_cache_dir`
+
+    If ``app`` is provided and :confval:`linkcode_watch` is enabled, the parsed source files are kept in
+    memory after the build, and reused by the next build in the same process until they change
+
+    The returned function has a ``prefetch(modnames, executor)`` attribute, which starts parsing the
+    source files of the given packages in the ``executor`` so that resolving their links doesn't parse them
     """
-    if repo_dir is None:
-        repo_dir = get_repo_dir()
+    index = None
+    static_index = None
 
-    def linkcode_resolve(domain, info):
-        """Returns a link to the source code on GitHub, with appropriate lines highlighted
+    def init() -> None:
+        nonlocal repo_dir, roots, index, static_index, source_roots, cache
 
-        :By:
-            Adam Korn (https://github.com/tdkorn)
-        :Adapted From:
-            nlgranger/SeqTools (https://github.com/nlgranger/seqtools/blob/master/docs/conf.py)
-        """
-        if domain != 'py' or not info['module']:
+        if app is not None and get_conf_val(app, 'linkcode_watch'):
+            key = get_state_key(app)
+            state = registry.get_state(key)
+            if state is not None and repo_dir in (None, state.repo_dir):
+                repo_dir = state.repo_dir
+                if roots is None:
+                    roots = get_root_index(app, repo_dir, linkcode_url)
+                    roots.paths = state.paths
+                    roots.contents = state.contents
+                index, static_index = state.index, state.static_index
+                index.roots = roots
+                if static_index is not None:
+                    static_index.roots = roots
+                return
+
+        if repo_dir is None:
+            repo_dir = get_repo_dir()
+        if roots is None:
+            if app is not None:
+                roots = get_root_index(app, repo_dir, linkcode_url)
+            else:
+                roots = RootIndex({repo_dir: linkcode_url})
+        if cache is None and app is not None:
+            cache = get_blob_cache(app)
+        if source_roots is None and app is not None:
+            source_roots = get_source_roots(app, repo_dir)
+        if source_roots is not None:
+            static_index = StaticIndex(source_roots, repo_dir, roots, cache)
+        index = LocationIndex(repo_dir, roots, cache)
+
+        if app is not None and get_conf_val(app, 'linkcode_watch'):
+            registry.set_state(get_state_key(app), registry.LinkcodeState(repo_dir, index, static_index))
+
+    def find_module_file(modname: str) -> Optional[str]:
+        if static_index is not None:
+            return static_index.find_module_file(modname)
+        try:
+            spec = importlib.util.find_spec(modname)
+        except (ImportError, ValueError):
             return None
+        origin = getattr(spec, 'origin', None)
+        return origin if origin and origin.endswith('.py') else None
 
-        modname = info['module']
-        fullname = info['fullname']
+    def prefetch(modnames: Iterable[str], executor: Executor) -> int:
+        """Starts parsing the source files of modules and every module within them in the background
+
+        :param modnames: the fully qualified names of the modules or packages
+        :param executor: the pool to parse the files in
+        :return: the number of files that were submitted
+        """
+        if index is None:
+            init()
+
+        files = {}
+        for modname in modnames:
+            path = find_module_file(modname)
+            if path is None:
+                logger.warning(f"sphinx-github-style: can't prefetch {modname!r}; source file not found",
+                               type='linkcode', subtype='prefetch')
+                continue
+            files.update(walk_package(modname, path))
+
+        if static_index is not None:
+            return static_index.prefetch(files, executor)
+        return index.prefetch(files, executor)
+
+    def find_location(modname: str, fullname: str) -> Tuple[Optional[SourceLocation], str]:
+        if static_index is not None:
+            return static_index.lookup(modname, fullname)
 
         submod = sys.modules.get(modname)
         if submod is None:
-            return None
+            return None, 'no_module'
 
         obj = submod
         for part in fullname.split('.'):
             try:
                 obj = getattr(obj, part)
             except AttributeError:
-                return None
+                return None, 'attribute_error'
 
         if isinstance(obj, property):
             obj = obj.fget
         elif isinstance(obj, cached_property):
             obj = obj.func
 
-        try:
-            modpath = inspect.getsourcefile(inspect.unwrap(obj))
-            filepath = Path(modpath).relative_to(repo_dir)
-            if filepath is None:
-                return
-        except Exception:
-            return None
+        location = index.get_object_location(obj) or inspect_location(obj, repo_dir, roots)
+        if location is not None:
+            return location, 'resolved'
 
-        try:
-            source, lineno = inspect.getsourcelines(obj)
-        except Exception:
+        sourcefile = get_source_file(obj)
+        if sourcefile is not None and roots.find(sourcefile) is None:
+            return None, 'outside_repo'
+        return None, 'no_source'
+
+    def linkcode_resolve(domain, info):
+        """Returns a link to the source code on GitHub, with appropriate lines highlighted
+
+        :By:
+            Adam Korn (https://github.com/tdkorn)
+        :Adapted From:
+            nlgranger/SeqTools (https://github.com/nlgranger/seqtools/blob/master/docs/conf.py)
+        """
+        if domain != 'py' or not info['module']:
             return None
 
-        linestart, linestop = lineno, lineno + len(source) - 1
+        modname = info['module']
+        fullname = info['fullname']
+        start = time.perf_counter()
+
+        if index is None:
+            init()
+
+        location = None
+        if app is not None:
+            location = get_linkcode_location(app.env, (modname, fullname))
+
+        if location is not None:
+            status = 'cached'
+        else:
+            location, status = find_location(modname, fullname)
+            if location is not None and app is not None:
+                path = os.path.join(location.root or repo_dir, location.filepath)
+                set_linkcode_location(app.env, (modname, fullname), path, location, find_module_file(modname))
+
+                url = roots.get_url(location.root)
+                if isinstance(url, LinkcodeUrl) and url.file_revisions is not None:
+                    set_linkcode_revision(app.env, path, url.file_revisions.get(location.filepath, ''))
+
+        if app is not None:
+            record_linkcode_stat(app.env, status, time.perf_counter() - start)
+
+        if location is None:
+            logger.debug(f"sphinx-github-style: no link for {modname}.{fullname} ({status})")
+            return None
 
         # Example: https://github.com/TDKorn/my-magento/blob/docs/magento/models/model.py#L28-L59
-        final_link = linkcode_url.format(
-            filepath=filepath.as_posix(),
-            linestart=linestart,
-            linestop=linestop
-        )
-        print(f"Final Link for {fullname}: {final_link}")
+        url = roots.get_url(location.root) or linkcode_url
+        final_link = url.format(**location._asdict())
+        logger.debug(f"Final Link for {fullname}: {final_link}")
         return final_link
 
+    linkcode_resolve.prefetch = prefetch
     return linkcode_resolve
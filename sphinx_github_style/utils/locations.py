@@ -0,0 +1,351 @@
+import os
+import sys
+import ast
+import inspect
+import tokenize
+from pathlib import Path
+from importlib.util import decode_source
+from concurrent.futures import Executor, Future
+from typing import Dict, Iterable, Iterator, Optional, Tuple, NamedTuple
+from sphinx_github_style.utils.roots import RootIndex
+from sphinx_github_style.utils.blob_cache import BlobCache, get_blob_sha
+
+
+class SourceLocation(NamedTuple):
+    """The location of an object's source code within the repository"""
+
+    filepath: str  #: The path of the source file, relative to the repository root
+    linestart: int  #: The first line of the object's source code
+    linestop: int  #: The last line of the object's source code
+    root: Optional[str] = None  #: The root directory that ``filepath`` is relative to
+
+
+class IndexedFile(NamedTuple):
+    """The indexed contents of a single source file"""
+
+    fingerprint: Tuple[int, int]  #: The ``(mtime_ns, size)`` of the file when it was indexed
+    filepath: Optional[str]  #: The path of the file relative to the repository, or ``None`` if it's outside of it
+    locations: Dict[str, Optional[Tuple[int, int]]]  #: Mapping of qualified names to line ranges
+    root: Optional[str] = None  #: The root directory that ``filepath`` is relative to
+
+
+def get_fingerprint(path: str) -> Tuple[int, int]:
+    """Returns the ``(mtime_ns, size)`` of a file, used to detect when it has changed
+
+    :param path: the path to the file
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_locations(source: str, tree: Optional[ast.Module] = None,
+                    resolve_duplicates: bool = False) -> Dict[str, Optional[Tuple[int, int]]]:
+    """Parses Python source code and maps the qualified name of every class and function to its line range
+
+    Line ranges match :func:`inspect.getsourcelines`: they start at the first decorator and
+    include any trailing comments that are indented at least as much as the body
+
+    .. note:: Names defined more than once (ex. property setters) map to ``None``, since
+       the definition used at runtime can't be determined without importing the module
+
+    :param source: the source code to parse
+    :param tree: the already parsed source code, if available
+    :param resolve_duplicates: map names that are defined more than once to their last definition instead of
+       ``None``, like the module would at runtime; property setters and deleters keep the getter's location
+    """
+    locations = {}
+    lines = source.splitlines()
+
+    def get_linestop(node):
+        linestop = node.end_lineno
+        body_col = node.body[0].col_offset
+
+        for lineno in range(node.end_lineno, len(lines)):
+            line = lines[lineno].lstrip()
+            if line.startswith('#'):
+                if len(lines[lineno]) - len(line) >= body_col:
+                    linestop = lineno + 1
+            elif line:
+                break
+        return linestop
+
+    def is_accessor(node):
+        return any(
+            isinstance(d, ast.Attribute) and d.attr in ('setter', 'deleter')
+            and isinstance(d.value, ast.Name) and d.value.id == node.name
+            for d in node.decorator_list
+        )
+
+    def visit(body, prefix):
+        for node in body:
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                qualname = prefix + node.name
+                linestart = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                if qualname not in locations:
+                    locations[qualname] = (linestart, get_linestop(node))
+                elif not resolve_duplicates:
+                    locations[qualname] = None
+                elif not is_accessor(node):
+                    locations[qualname] = (linestart, get_linestop(node))
+
+                if isinstance(node, ast.ClassDef):
+                    visit(node.body, qualname + '.')
+                else:
+                    visit(node.body, qualname + '.<locals>.')
+            else:
+                # Definitions nested in if/try/with/for/while blocks keep the same prefix
+                for field in ('body', 'orelse', 'finalbody'):
+                    visit(getattr(node, field, None) or [], prefix)
+                for handler in getattr(node, 'handlers', None) or []:
+                    visit(handler.body, prefix)
+
+    visit((tree or ast.parse(source)).body, '')
+    return locations
+
+
+def read_source(path: str, cache: Optional[BlobCache] = None) -> Tuple[Tuple[int, int], str, Optional[str]]:
+    """Reads a source file, decoding it like the interpreter would
+
+    :param path: the absolute path of the source file
+    :param cache: the :class:`~.BlobCache` that the file will be looked up in, if any
+    :return: the fingerprint of the file, its source code, and its git blob hash if a ``cache`` is provided
+    :raises OSError: if the file can't be read
+    :raises SyntaxError: if the file's encoding can't be determined
+    """
+    fingerprint = get_fingerprint(path)
+    if cache is None:
+        with tokenize.open(path) as f:
+            return fingerprint, f.read(), None
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    return fingerprint, decode_source(data), get_blob_sha(data)
+
+
+def read_locations(path: str, cache: Optional[BlobCache] = None
+                   ) -> Optional[Tuple[Tuple[int, int], Dict[str, Optional[Tuple[int, int]]]]]:
+    """Reads a source file and parses the line range of every class and function in it
+
+    Runs in :meth:`LocationIndex.prefetch` workers, so it only returns picklable values
+
+    :param path: the absolute path of the source file
+    :param cache: the :class:`~.BlobCache` to reuse the locations of unchanged files from, if any
+    :return: the fingerprint of the file and its locations, as returned by :func:`parse_locations`,
+       or ``None`` if the file can't be read or parsed
+    """
+    try:
+        fingerprint, source, sha = read_source(path, cache)
+        if sha is not None:
+            cached = cache.get(sha, 'locations')
+            if cached is not None:
+                return fingerprint, {name: tuple(lines) if lines else None for name, lines in cached.items()}
+
+        locations = parse_locations(source)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    if sha is not None:
+        cache.set(sha, 'locations', locations)
+    return fingerprint, locations
+
+
+def walk_package(modname: str, path: str) -> Iterator[Tuple[str, str]]:
+    """Yields the source file of a module and, if it's a package, of every module within it
+
+    :param modname: the fully qualified name of the module
+    :param path: the path of the module's source file
+    :return: the ``(path, modname)`` of each source file
+    """
+    yield path, modname
+    if os.path.basename(path) != '__init__.py':
+        return
+
+    package_dir = os.path.dirname(path)
+    for dirpath, dirnames, filenames in os.walk(package_dir):
+        # Only descend into subpackages
+        dirnames[:] = sorted(d for d in dirnames if os.path.isfile(os.path.join(dirpath, d, '__init__.py')))
+        relpath = os.path.relpath(dirpath, package_dir)
+        prefix = modname if relpath == '.' else '.'.join([modname, *relpath.split(os.sep)])
+
+        for filename in sorted(filenames):
+            if not filename.endswith('.py'):
+                continue
+            if filename == '__init__.py':
+                if dirpath != package_dir:
+                    yield os.path.join(dirpath, filename), prefix
+            else:
+                yield os.path.join(dirpath, filename), f"{prefix}.{filename[:-3]}"
+
+
+class LocationIndex:
+    """Index of the source code locations for every class and function in a file
+
+    Each file is parsed once, the first time one of its objects is looked up; every lookup
+    after that is a dictionary hit. Files are keyed by their fingerprint, so modified files
+    can be detected and re-indexed with :meth:`refresh`. Files can also be indexed ahead of time
+    by a pool of workers, using :meth:`prefetch`
+
+    :param repo_dir: the root directory of the repository
+    :param roots: the :class:`~.RootIndex` to find the repository of each file with, if there are several
+    :param cache: the :class:`~.BlobCache` to share the locations of each file with other builds, if any
+    """
+
+    def __init__(self, repo_dir: Path, roots: Optional[RootIndex] = None, cache: Optional[BlobCache] = None):
+        self.repo_dir = Path(repo_dir)
+        self.roots = roots or RootIndex({self.repo_dir: None})
+        self.cache = cache
+        self.files: Dict[str, IndexedFile] = {}
+        self.pending: Dict[str, Future] = {}
+        self.pid = os.getpid()
+
+    def prefetch(self, paths: Iterable[str], executor: Executor) -> int:
+        """Starts indexing source files in the background, so that looking up their objects doesn't parse them
+
+        :param paths: the absolute paths of the source files
+        :param executor: the pool to parse the files in
+        :return: the number of files that were submitted
+        """
+        self.pid = os.getpid()
+        submitted = 0
+        for path in paths:
+            if path not in self.files and path not in self.pending:
+                self.pending[path] = executor.submit(read_locations, path, self.cache)
+                submitted += 1
+        return submitted
+
+    def get_file(self, path: str) -> Optional[IndexedFile]:
+        """Returns the :class:`IndexedFile` for a source file, indexing it if needed
+
+        If the file was submitted to :meth:`prefetch`, waits for its result instead of parsing it again.
+        Processes forked from the one that submitted it (ex. by ``sphinx-build -j``) parse it themselves
+
+        :param path: the absolute path of the source file
+        """
+        indexed = self.files.get(path)
+        if indexed is not None:
+            return indexed
+
+        future = self.pending.pop(path, None)
+        if future is not None and self.pid == os.getpid():
+            try:
+                result = future.result()
+            except Exception:  # The pool was shut down or broken; parse the file here instead
+                result = read_locations(path, self.cache)
+            return self.add_file(path, result)
+
+        return self.index_file(path)
+
+    def index_file(self, path: str) -> Optional[IndexedFile]:
+        """Parses a source file and adds its locations to the index
+
+        :param path: the absolute path of the source file
+        :return: the :class:`IndexedFile`, or ``None`` if the file can't be read or parsed
+        """
+        return self.add_file(path, read_locations(path, self.cache))
+
+    def add_file(self, path: str, result: Optional[Tuple[Tuple[int, int], Dict]]) -> Optional[IndexedFile]:
+        """Adds the locations of a source file to the index
+
+        :param path: the absolute path of the source file
+        :param result: the fingerprint and locations of the file, as returned by :func:`read_locations`
+        """
+        if result is None:
+            return None
+
+        fingerprint, locations = result
+        root, filepath = self.roots.find(path) or (None, None)
+        indexed = self.files[path] = IndexedFile(fingerprint, filepath, locations, root)
+        return indexed
+
+    def refresh(self) -> Dict[str, IndexedFile]:
+        """Removes every file that was modified or deleted since it was indexed
+
+        :return: the removed entries, keyed by path
+        """
+        removed = {}
+        for path, indexed in list(self.files.items()):
+            try:
+                if get_fingerprint(path) == indexed.fingerprint:
+                    continue
+            except OSError:
+                pass
+            removed[path] = self.files.pop(path)
+        return removed
+
+    def lookup(self, path: str, qualname: str) -> Optional[SourceLocation]:
+        """Returns the :class:`SourceLocation` of an object from its source file and qualified name
+
+        :param path: the absolute path of the source file
+        :param qualname: the qualified name of the object
+        """
+        indexed = self.get_file(path)
+        if indexed is None or indexed.filepath is None:
+            return None
+
+        lines = indexed.locations.get(qualname)
+        if lines is None:
+            return None
+
+        return SourceLocation(indexed.filepath, *lines, indexed.root)
+
+    def get_object_location(self, obj) -> Optional[SourceLocation]:
+        """Returns the :class:`SourceLocation` of a class or function using the index
+
+        :param obj: the object to locate
+        :return: the location, or ``None`` if the object isn't in the index
+        """
+        if not (inspect.isclass(obj) or inspect.isroutine(obj)):
+            return None
+        try:
+            obj = inspect.unwrap(obj)
+        except ValueError:
+            return None
+
+        qualname = getattr(obj, '__qualname__', None)
+        module = sys.modules.get(getattr(obj, '__module__', None) or '')
+        path = getattr(module, '__file__', None)
+
+        if not (isinstance(qualname, str) and path and path.endswith('.py')):
+            return None
+
+        code = getattr(obj, '__code__', None)
+        if code is not None and os.path.normcase(code.co_filename) != os.path.normcase(path):
+            return None
+
+        return self.lookup(path, qualname)
+
+
+def get_source_file(obj) -> Optional[str]:
+    """Returns the path of the file an object was defined in, or ``None`` if it can't be determined
+
+    :param obj: the object to find the source file of
+    """
+    try:
+        return inspect.getsourcefile(inspect.unwrap(obj))
+    except Exception:
+        return None
+
+
+def inspect_location(obj, repo_dir: Path, roots: Optional[RootIndex] = None) -> Optional[SourceLocation]:
+    """Returns the :class:`SourceLocation` of an object using :mod:`inspect`
+
+    Used as a fallback for objects that can't be found in the :class:`LocationIndex`
+
+    :param obj: the object to locate
+    :param repo_dir: the root directory of the repository
+    :param roots: the :class:`~.RootIndex` to find the repository of the file with, if there are several
+    """
+    modpath = get_source_file(obj)
+    if modpath is None:
+        return None
+
+    root, filepath = (roots or RootIndex({repo_dir: None})).find(modpath) or (None, None)
+    if filepath is None:
+        return None
+
+    try:
+        source, lineno = inspect.getsourcelines(obj)
+    except Exception:
+        return None
+
+    return SourceLocation(filepath, lineno, lineno + len(source) - 1, root)
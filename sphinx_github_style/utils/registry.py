@@ -0,0 +1,160 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+from sphinx.util import logging
+from sphinx_github_style.utils.git import GitError, find_repository, load_repository, get_file_revisions
+from sphinx_github_style.utils.locations import LocationIndex, get_fingerprint
+from sphinx_github_style.utils.static import StaticIndex
+from sphinx_github_style.utils.roots import ContentIndex
+
+logger = logging.getLogger(__name__)
+
+
+class LinkcodeState:
+    """The state of a ``linkcode_resolve`` function that's kept in memory between builds in the same process
+
+    Source files are only parsed again once they change, as detected by comparing their fingerprints
+
+    :param repo_dir: the root directory of the repository
+    :param index: the :class:`~.LocationIndex` of the parsed source files
+    :param static_index: the :class:`~.StaticIndex` of the parsed modules, if links are resolved without importing
+    """
+
+    def __init__(self, repo_dir: Path, index: LocationIndex, static_index: Optional[StaticIndex] = None):
+        self.repo_dir = repo_dir
+        self.index = index
+        self.static_index = static_index
+        self.paths: Dict[str, Optional[Tuple[str, str]]] = index.roots.paths
+        self.contents: Optional[ContentIndex] = index.roots.contents
+
+    def refresh(self) -> int:
+        """Removes the parsed source files that were modified or deleted since they were parsed
+
+        :return: the number of files that were removed
+        """
+        removed = len(self.index.refresh())
+        if self.static_index is not None:
+            count = len(self.static_index.modules)
+            self.static_index.refresh()
+            removed += count - len(self.static_index.modules)
+
+            # Modules that weren't found may have been created since
+            for modname, path in list(self.static_index.paths.items()):
+                if path is None:
+                    del self.static_index.paths[modname]
+
+        # Files found by their contents may match a different file now
+        if removed and self.contents is not None:
+            self.contents.files = None
+            self.paths.clear()
+        return removed
+
+
+#: The state of each ``linkcode_resolve`` function, by the configuration it was created with
+_states: Dict[Hashable, LinkcodeState] = {}
+
+#: The revision to link to for each ``(repo_dir, blob)``, and the fingerprint of the repository it was determined from
+_revisions: Dict[Tuple[str, str], Tuple[Any, str]] = {}
+
+#: The last commit to modify each file of each repository, and the fingerprint of the repository they were read from
+_file_revisions: Dict[str, Tuple[Any, Dict[str, str]]] = {}
+
+
+def get_state(key: Hashable) -> Optional[LinkcodeState]:
+    """Returns the state stored by a previous build, refreshed to remove any source files that changed
+
+    :param key: the configuration the state was created with
+    """
+    state = _states.get(key)
+    if state is not None:
+        state.refresh()
+    return state
+
+
+def set_state(key: Hashable, state: LinkcodeState) -> None:
+    """Stores the state of a ``linkcode_resolve`` function for later builds
+
+    :param key: the configuration the state was created with
+    """
+    _states[key] = state
+
+
+def get_git_fingerprint(repo_dir: Optional[Path] = None) -> Optional[Tuple]:
+    """Returns the fingerprints of the files that determine the revision of a repository
+
+    Covers ``HEAD``, the branch it points to, ``packed-refs`` and the tags directory,
+    so the fingerprint changes when a commit is made, a branch is checked out, or a tag is created
+
+    :param repo_dir: a directory in the repository; defaults to the current working directory
+    :return: the fingerprints, or ``None`` if the repository can't be found
+    """
+    repo = find_repository(repo_dir)
+    if repo is None:
+        return None
+
+    paths = [repo.git_dir / 'HEAD', repo.common_dir / 'packed-refs', repo.common_dir / 'refs' / 'tags']
+    try:
+        head = paths[0].read_text().strip()
+    except OSError:
+        return None
+    if head.startswith('ref:'):
+        paths.append(repo.common_dir / head[4:].strip())
+
+    fingerprint = []
+    for path in paths:
+        try:
+            fingerprint.append(get_fingerprint(str(path)))
+        except OSError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+def get_revision(blob: str, repo_dir: Optional[Path] = None) -> str:
+    """Returns the revision to link to, reusing the one determined by a previous build if the repository hasn't changed
+
+    :param blob: the blob to link to, as in :confval:`linkcode_blob`
+    :param repo_dir: a directory in the repository; defaults to the current working directory
+    """
+    from sphinx_github_style.utils.linkcode import get_linkcode_revision
+
+    key = (os.path.abspath(repo_dir or os.getcwd()), blob)
+    fingerprint = get_git_fingerprint(repo_dir)
+    cached = _revisions.get(key)
+    if fingerprint is not None and cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    # Repository metadata is memoized, so it needs to be read again
+    load_repository.cache_clear()
+    revision = get_linkcode_revision(blob, repo_dir)
+    _revisions[key] = (fingerprint, revision)
+    return revision
+
+
+def load_file_revisions(repo_dir: Optional[Path] = None) -> Dict[str, str]:
+    """Returns the last commit to modify each file in a repository, reading the history again only once it changes
+
+    :param repo_dir: a directory in the repository; defaults to the current working directory
+    :return: mapping of the path of each file relative to the root of the repository to a commit SHA,
+       as returned by :func:`~.get_file_revisions`; empty if the history can't be read
+    """
+    repo = find_repository(repo_dir)
+    key = str(repo.work_dir) if repo else os.path.abspath(repo_dir or os.getcwd())
+    fingerprint = get_git_fingerprint(repo_dir)
+    cached = _file_revisions.get(key)
+    if fingerprint is not None and cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    try:
+        revisions = get_file_revisions(repo_dir)
+    except GitError as e:
+        logger.info(f"sphinx-github-style: unable to read the history of {key}, linking to HEAD instead ({e})")
+        revisions = {}
+    _file_revisions[key] = (fingerprint, revisions)
+    return revisions
+
+
+def clear() -> None:
+    """Removes all stored state"""
+    _states.clear()
+    _revisions.clear()
+    _file_revisions.clear()
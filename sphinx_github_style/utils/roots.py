@@ -0,0 +1,157 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sphinx_github_style.utils.blob_cache import get_blob_sha
+
+#: Directories that are skipped when listing the files of a root without ``git``
+IGNORED_DIRS = {'__pycache__', 'site-packages', 'dist-packages', 'node_modules', 'build', 'dist'}
+
+
+def normalize_path(path) -> str:
+    """Returns the absolute, case-normalized form of a path, used to compare paths across roots"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def list_source_files(root: str) -> List[str]:
+    """Returns the ``/``-separated paths of the Python files in a root, relative to the root
+
+    Uses ``git ls-files`` to list tracked and untracked files that aren't ignored, so virtual environments and
+    build directories are skipped. If that fails, the directory is walked instead, skipping hidden directories
+
+    :param root: the root directory
+    """
+    from sphinx_github_style.utils.git import GitError, run_git
+
+    try:
+        output = run_git("git ls-files -z --cached --others --exclude-standard -- *.py", cwd=Path(root))
+        return [path for path in output.split('\0') if path]
+    except GitError:
+        pass
+
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d not in IGNORED_DIRS]
+        for filename in filenames:
+            if filename.endswith('.py'):
+                paths.append(Path(os.path.relpath(os.path.join(dirpath, filename), root)).as_posix())
+    return paths
+
+
+class ContentIndex:
+    """Maps the contents of the Python files in each root to their paths, to find the source of installed copies
+
+    Used when the documented package is installed from a wheel rather than in editable mode,
+    so its modules are loaded from ``site-packages`` instead of the repository. Files are keyed by
+    their git blob hash. The roots are only listed and hashed the first time a file is looked up
+
+    :param roots: the normalized root directories
+    """
+
+    def __init__(self, roots: Iterable[str]):
+        self.roots = list(roots)
+        self.files: Optional[Dict[str, List[Tuple[str, str]]]] = None
+
+    def build(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Lists and hashes the Python files in every root
+
+        :return: mapping of each git blob hash to the roots and relative paths of the files with that content
+        """
+        files = {}
+        for root in self.roots:
+            for relpath in list_source_files(root):
+                try:
+                    with open(os.path.join(root, relpath), 'rb') as f:
+                        sha = get_blob_sha(f.read())
+                except OSError:
+                    continue
+                files.setdefault(sha, []).append((root, relpath))
+        return files
+
+    def find(self, path: str) -> Optional[Tuple[str, str]]:
+        """Returns the root and relative path of the file in the roots with the same contents as a file
+
+        If several files have the same contents (ex. empty ``__init__.py`` files), the one whose path
+        has the longest common suffix with the file's path is returned
+
+        :param path: the absolute path of the file
+        :return: the normalized root directory and the ``/``-separated relative path,
+           or ``None`` if no file in the roots has the same contents
+        """
+        try:
+            with open(path, 'rb') as f:
+                sha = get_blob_sha(f.read())
+        except OSError:
+            return None
+
+        if self.files is None:
+            self.files = self.build()
+
+        candidates = self.files.get(sha)
+        if not candidates:
+            return None
+
+        parts = Path(path).parts[::-1]
+
+        def common_suffix(candidate):
+            count = 0
+            for part, other in zip(parts, candidate[1].split('/')[::-1]):
+                if part != other:
+                    break
+                count += 1
+            return count
+
+        return max(candidates, key=common_suffix)
+
+
+class RootIndex:
+    """Maps source files to the root directory they belong to, and each root to the URL to link it with
+
+    Used when the documented code is spread across several repositories (ex. git submodules or
+    sibling checkouts in a monorepo). Nested roots take precedence over the roots that contain them.
+    Each file path is resolved once, after which it's a single dictionary lookup
+
+    :param roots: mapping of each root directory to the template URL (or :class:`~.LinkcodeUrl`) to link it with
+    :param match_contents: whether to find files outside of the roots (ex. installed in ``site-packages``)
+       by their contents, using a :class:`ContentIndex`
+    """
+
+    def __init__(self, roots: Dict[Any, Any], match_contents: bool = False):
+        self.urls: Dict[str, Any] = {normalize_path(root): url for root, url in roots.items()}
+        self.paths: Dict[str, Optional[Tuple[str, str]]] = {}
+        self.contents = ContentIndex(self.urls) if match_contents else None
+
+    def find(self, path: str) -> Optional[Tuple[str, str]]:
+        """Returns the root that contains a file, and the path of the file relative to it
+
+        :param path: the absolute path of the file
+        :return: the normalized root directory and the ``/``-separated relative path,
+           or ``None`` if the file isn't in any of the roots (or, if ``match_contents`` is enabled,
+           if no file in the roots has the same contents)
+        """
+        try:
+            return self.paths[path]
+        except KeyError:
+            pass
+
+        found = None
+        file = normalize_path(path)
+        directory = os.path.dirname(file)
+
+        while True:
+            if directory in self.urls:
+                found = directory, Path(os.path.relpath(file, directory)).as_posix()
+                break
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+
+        if found is None and self.contents is not None:
+            found = self.contents.find(path)
+
+        self.paths[path] = found
+        return found
+
+    def get_url(self, root: Optional[str]) -> Any:
+        """Returns the template URL (or :class:`~.LinkcodeUrl`) of a root, as returned by :meth:`find`"""
+        return self.urls.get(root)
@@ -0,0 +1,244 @@
+import os
+import ast
+from pathlib import Path
+from concurrent.futures import Executor, Future
+from typing import Dict, List, Mapping, Optional, Tuple, NamedTuple
+from sphinx_github_style.utils.locations import SourceLocation, get_fingerprint, parse_locations, read_source
+from sphinx_github_style.utils.roots import RootIndex
+from sphinx_github_style.utils.blob_cache import BlobCache
+
+
+class ParsedModule(NamedTuple):
+    """The parsed contents of a module's source file"""
+
+    path: str  #: The absolute path of the source file
+    fingerprint: Tuple[int, int]  #: The ``(mtime_ns, size)`` of the file when it was parsed
+    locations: Dict[str, Optional[Tuple[int, int]]]  #: Mapping of qualified names to line ranges
+    imports: Dict[str, str]  #: Mapping of names imported with ``from ... import`` to their full names
+
+
+def parse_imports(tree: ast.Module, package: str) -> Dict[str, str]:
+    """Maps the names bound by module-level ``from ... import ...`` statements to the full names they refer to
+
+    Relative imports are resolved against ``package``, and star imports are ignored
+
+    :param tree: the parsed source code of the module
+    :param package: the package the module belongs to (the module itself, if it's a package's ``__init__.py``)
+    """
+    imports = {}
+
+    def visit(body):
+        for node in body:
+            if isinstance(node, ast.ImportFrom):
+                if node.level:
+                    parts = package.split('.') if package else []
+                    if node.level - 1 > len(parts):
+                        continue
+                    base = parts[:len(parts) - (node.level - 1)]
+                    if node.module:
+                        base.append(node.module)
+                    module = '.'.join(base)
+                else:
+                    module = node.module
+
+                for alias in node.names:
+                    if alias.name != '*' and module:
+                        imports[alias.asname or alias.name] = f"{module}.{alias.name}"
+
+            elif not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                # Imports nested in if/try blocks (ex. optional dependencies) are still module-level
+                for field in ('body', 'orelse', 'finalbody'):
+                    visit(getattr(node, field, None) or [])
+                for handler in getattr(node, 'handlers', None) or []:
+                    visit(handler.body)
+
+    visit(tree.body)
+    return imports
+
+
+def parse_module(path: str, modname: str, cache: Optional[BlobCache] = None) -> Optional[ParsedModule]:
+    """Reads and parses the source file of a module
+
+    Runs in :meth:`StaticIndex.prefetch` workers, so it only returns picklable values
+
+    :param path: the absolute path of the source file
+    :param modname: the fully qualified name of the module
+    :param cache: the :class:`~.BlobCache` to reuse the locations and imports of unchanged files from, if any
+    :return: the parsed module, or ``None`` if the file can't be read or parsed
+    """
+    package = modname if os.path.basename(path) == '__init__.py' else modname.rpartition('.')[0]
+    kind = f'static.{package}'  # Relative imports are resolved against the package
+
+    try:
+        fingerprint, source, sha = read_source(path, cache)
+        if sha is not None:
+            cached = cache.get(sha, kind)
+            if cached is not None:
+                locations = {name: tuple(lines) if lines else None for name, lines in cached['locations'].items()}
+                return ParsedModule(path, fingerprint, locations, cached['imports'])
+
+        tree = ast.parse(source)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    locations = parse_locations(source, tree, resolve_duplicates=True)
+    imports = parse_imports(tree, package)
+    if sha is not None:
+        cache.set(sha, kind, {'locations': locations, 'imports': imports})
+    return ParsedModule(path, fingerprint, locations, imports)
+
+
+class StaticIndex:
+    """Resolves the source code location of objects by parsing their modules with :mod:`ast`, without importing them
+
+    Module names are mapped to files within the ``source_roots``, in order. Each file is parsed
+    once, the first time one of its objects is looked up. Names imported with ``from ... import``
+    are followed by one hop, so objects documented where they're re-exported (ex. in a package's
+    ``__init__.py``) link to where they're defined. Modules can also be parsed ahead of time by a pool
+    of workers, using :meth:`prefetch`
+
+    :param source_roots: the directories that contain the top-level packages and modules
+    :param repo_dir: the root directory of the repository
+    :param roots: the :class:`~.RootIndex` to find the repository of each file with, if there are several
+    :param cache: the :class:`~.BlobCache` to share the parsed modules with other builds, if any
+    """
+
+    def __init__(self, source_roots: List[Path], repo_dir: Path, roots: Optional[RootIndex] = None,
+                 cache: Optional[BlobCache] = None):
+        self.source_roots = [Path(root).resolve() for root in source_roots]
+        self.repo_dir = Path(repo_dir).resolve()
+        self.roots = roots or RootIndex({self.repo_dir: None})
+        self.cache = cache
+        self.paths: Dict[str, Optional[str]] = {}
+        self.modules: Dict[str, ParsedModule] = {}
+        self.pending: Dict[str, Future] = {}
+        self.pid = os.getpid()
+
+    def find_module_file(self, modname: str) -> Optional[str]:
+        """Returns the absolute path of a module's source file, or ``None`` if it isn't in any of the source roots
+
+        :param modname: the fully qualified name of the module
+        """
+        if modname in self.paths:
+            return self.paths[modname]
+
+        path = None
+        parts = modname.split('.')
+        for root in self.source_roots:
+            for candidate in (root.joinpath(*parts[:-1], parts[-1] + '.py'), root.joinpath(*parts, '__init__.py')):
+                if candidate.is_file():
+                    path = str(candidate)
+                    break
+            if path is not None:
+                break
+
+        self.paths[modname] = path
+        return path
+
+    def get_module(self, modname: str) -> Optional[ParsedModule]:
+        """Returns the :class:`ParsedModule` of a module, parsing its source file if needed
+
+        :param modname: the fully qualified name of the module
+        :return: the parsed module, or ``None`` if its source file can't be found, read or parsed
+        """
+        path = self.find_module_file(modname)
+        if path is None:
+            return None
+
+        parsed = self.modules.get(path)
+        if parsed is not None:
+            return parsed
+
+        future = self.pending.pop(path, None)
+        if future is not None and self.pid == os.getpid():
+            try:
+                parsed = future.result()
+            except Exception:  # The pool was shut down or broken; parse the file here instead
+                parsed = parse_module(path, modname, self.cache)
+        else:
+            parsed = parse_module(path, modname, self.cache)
+
+        if parsed is not None:
+            self.modules[path] = parsed
+        return parsed
+
+    def prefetch(self, files: Mapping[str, str], executor: Executor) -> int:
+        """Starts parsing modules in the background, so that looking up their objects doesn't parse them
+
+        Processes forked from the one that submitted them (ex. by ``sphinx-build -j``) parse them themselves
+
+        :param files: mapping of the absolute path of each source file to the name of its module
+        :param executor: the pool to parse the files in
+        :return: the number of files that were submitted
+        """
+        self.pid = os.getpid()
+        submitted = 0
+        for path, modname in files.items():
+            if path not in self.modules and path not in self.pending:
+                self.pending[path] = executor.submit(parse_module, path, modname, self.cache)
+                submitted += 1
+        return submitted
+
+    def refresh(self) -> None:
+        """Removes every module that was modified or deleted since it was parsed"""
+        for path, parsed in list(self.modules.items()):
+            try:
+                if get_fingerprint(path) == parsed.fingerprint:
+                    continue
+            except OSError:
+                pass
+            del self.modules[path]
+
+    def find(self, modname: str, fullname: str) -> Tuple[Optional[ParsedModule], Optional[Tuple[int, int]]]:
+        """Finds the module that defines an object and its line range, following one ``from ... import``
+
+        :param modname: the name of the module the object is documented in
+        :param fullname: the qualified name of the object within the module
+        :return: the :class:`ParsedModule` that defines the object, or ``None`` if the module can't be found,
+           and the line range of the object, or ``None`` if it isn't defined there
+        """
+        module = self.get_module(modname)
+        if module is None:
+            return None, None
+        if fullname in module.locations:
+            return module, module.locations[fullname]
+
+        head, _, rest = fullname.partition('.')
+        target = module.imports.get(head)
+        if target is None:
+            return module, None
+
+        # The imported name is either an object in another module or a submodule
+        target_mod, _, name = target.rpartition('.')
+        qualname = f"{name}.{rest}" if rest else name
+        imported = self.get_module(target_mod)
+        if imported is not None and qualname in imported.locations:
+            return imported, imported.locations[qualname]
+
+        if rest:
+            submodule = self.get_module(target)
+            if submodule is not None:
+                return submodule, submodule.locations.get(rest)
+
+        return imported or module, None
+
+    def lookup(self, modname: str, fullname: str) -> Tuple[Optional[SourceLocation], str]:
+        """Returns the :class:`~.SourceLocation` of an object, without importing it
+
+        :param modname: the name of the module the object is documented in
+        :param fullname: the qualified name of the object within the module
+        :return: the location, or ``None`` if it can't be determined, and the status of the lookup:
+           ``"resolved"``, ``"no_module"``, ``"attribute_error"`` or ``"outside_repo"``
+        """
+        module, lines = self.find(modname, fullname)
+        if module is None:
+            return None, 'no_module'
+        if lines is None:
+            return None, 'attribute_error'
+
+        found = self.roots.find(module.path)
+        if found is None:
+            return None, 'outside_repo'
+
+        root, filepath = found
+        return SourceLocation(filepath, *lines, root), 'resolved'
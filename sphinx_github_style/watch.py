@@ -0,0 +1,148 @@
+"""Rebuilds the documentation whenever a source file changes, keeping the state of ``linkcode_resolve`` in memory
+
+Usage::
+
+    python -m sphinx_github_style.watch docs/source docs/build/html [--interval 0.5] [--watch PATH] [SPHINX_ARGS...]
+
+Any arguments that aren't listed below are passed to ``sphinx-build``. Every build runs in the same process
+with :confval:`linkcode_watch` enabled, so only the source files that changed are parsed again
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+#: Directories that are never watched
+IGNORED_DIRS = {'.git', '.hg', '.svn', '.tox', '.nox', '.venv', 'venv', '__pycache__', 'node_modules'}
+
+#: Top-level packages that are never reloaded between builds
+PRESERVED_PACKAGES = {'sphinx', 'docutils', 'pygments', 'sphinx_github_style'}
+
+
+def scan_files(paths: Iterable[Path], ignored: Set[Path]) -> Dict[str, Tuple[int, int]]:
+    """Returns the fingerprint of every file in the given files and directories
+
+    :param paths: the files and directories to scan
+    :param ignored: directories to skip, such as the output directory
+    :return: mapping of each file to its modification time and size
+    """
+    files = {}
+    for path in paths:
+        if path.is_file():
+            stat = path.stat()
+            files[str(path)] = (stat.st_mtime_ns, stat.st_size)
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [
+                name for name in dirnames
+                if name not in IGNORED_DIRS and Path(dirpath, name).resolve() not in ignored
+            ]
+            for name in filenames:
+                file = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue
+                files[file] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def get_module_files(roots: Iterable[Path]) -> Dict[str, str]:
+    """Returns the source file of every imported module within the given directories
+
+    :param roots: the directories containing the documented code
+    :return: mapping of each source file to the name of its module
+    """
+    roots = [str(root) + os.sep for root in roots]
+    files = {}
+    for modname, module in list(sys.modules.items()):
+        file = getattr(module, '__file__', None)
+        if file and file.endswith('.py'):
+            file = os.path.abspath(file)
+            if any(file.startswith(root) for root in roots):
+                files[file] = modname
+    return files
+
+
+def unload_modules(modnames: Iterable[str]) -> List[str]:
+    """Removes the top-level packages of the given modules from :data:`sys.modules`
+
+    The next build imports them again
+
+    :param modnames: the names of the modules that changed
+    :return: the names of the packages that were unloaded
+    """
+    packages = {modname.partition('.')[0] for modname in modnames} - PRESERVED_PACKAGES
+    for modname in list(sys.modules):
+        if modname.partition('.')[0] in packages:
+            del sys.modules[modname]
+    return sorted(packages)
+
+
+def build(sourcedir: Path, outdir: Path, sphinx_args: List[str]) -> int:
+    """Builds the documentation in this process, with :confval:`linkcode_watch` enabled
+
+    :return: the exit code of ``sphinx-build``
+    """
+    from sphinx.cmd.build import build_main
+
+    start = time.perf_counter()
+    status = build_main([str(sourcedir), str(outdir), *sphinx_args, '-D', 'linkcode_watch=1'])
+    print(f"[watch] build finished in {time.perf_counter() - start:.2f}s (exit code {status})", file=sys.stderr)
+    return status
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sourcedir", type=Path, help="the directory containing conf.py and the documentation sources")
+    parser.add_argument("outdir", type=Path, help="the directory to write the output to")
+    parser.add_argument("--interval", type=float, default=0.5, help="the number of seconds between polls")
+    parser.add_argument(
+        "--watch", type=Path, action="append", default=[],
+        help="an additional file or directory to watch; defaults to the repository containing sourcedir"
+    )
+    args, sphinx_args = parser.parse_known_args(argv)
+
+    from sphinx_github_style.utils.git import find_repository
+
+    sourcedir, outdir = args.sourcedir.resolve(), args.outdir.resolve()
+    repo = find_repository(sourcedir)
+    watched = [path.resolve() for path in args.watch] or [repo.work_dir if repo else sourcedir]
+    if not any(sourcedir == path or path in sourcedir.parents for path in watched):
+        watched.append(sourcedir)
+    ignored = {outdir, sourcedir / '_build'}
+
+    # Scanned before building, so changes made during the build trigger another one
+    files = scan_files(watched, ignored)
+    build(sourcedir, outdir, sphinx_args)
+    print(f"[watch] watching {len(files)} files; press Ctrl+C to stop", file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = scan_files(watched, ignored)
+            changed = {file for file in current.keys() | files.keys() if current.get(file) != files.get(file)}
+            if not changed:
+                continue
+
+            files = current
+            print(f"[watch] {len(changed)} file(s) changed: {', '.join(sorted(changed)[:5])}", file=sys.stderr)
+            modules = get_module_files(watched)
+            changed_modules = [modules[file] for file in changed if file in modules]
+
+            if any(modname.partition('.')[0] == 'sphinx_github_style' for modname in changed_modules):
+                print("[watch] sphinx_github_style changed; restart to load the new version", file=sys.stderr)
+            unloaded = unload_modules(changed_modules)
+            if unloaded:
+                print(f"[watch] reloading {', '.join(unloaded)}", file=sys.stderr)
+
+            build(sourcedir, outdir, sphinx_args)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())